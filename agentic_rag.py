@@ -4,13 +4,247 @@ This module implements an intelligent agent that can reason, plan, and use multi
 to provide more precise and comprehensive answers.
 """
 
+import bisect
+import contextvars
+import hashlib
 import json
+import os
+import pickle
+import queue
 import re
+import threading
 import time
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
-import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator, NamedTuple
 import numpy as np
+import calc_kernels
+
+# orjson is optional; fall back to the standard library parser
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Common financial patterns, one named group per metric
+_METRIC_RE = re.compile(
+    r'revenue[:\s]+\$?(?P<revenue>\d+(?:,\d{3})*(?:\.\d+)?)'
+    r'|profit[:\s]+\$?(?P<profit>\d+(?:,\d{3})*(?:\.\d+)?)'
+    r'|p/e[:\s]+(?P<pe_ratio>\d+(?:\.\d+)?)'
+    r'|price[:\s]+\$?(?P<price>\d+(?:\.\d+)?)'
+    r'|volume[:\s]+(?P<volume>\d+(?:,\d{3})*)',
+    re.IGNORECASE
+)
+
+# Maximum number of chunks whose content type and key metrics are remembered
+_CONTENT_CACHE_SIZE = 4096
+
+# Trend direction by sign of (last - first); trends share these string objects rather than copies
+_TREND_DIRECTIONS = {1: 'upward', -1: 'downward', 0: 'stable'}
+
+# Trend pattern labels by calc_kernels PATTERN_* code
+_PATTERN_LABELS = {
+    calc_kernels.PATTERN_VOLATILE: 'volatile',
+    calc_kernels.PATTERN_GROWTH: 'consistent_growth',
+    calc_kernels.PATTERN_DECLINE: 'consistent_decline',
+    calc_kernels.PATTERN_INSUFFICIENT: 'insufficient_data'
+}
+
+# Volatility bin edges and the risk level of each bin; a value on an edge falls in the lower bin
+_RISK_THRESHOLDS = np.array([0.1, 0.3])
+_RISK_LEVELS = np.array(['Low', 'Medium', 'High'])
+_RISK_KEY_FORMAT = '{}_risk'.format
+
+# Pulls (best_performer, worst_performer) out of a comparison entry in one call
+_best_and_worst = itemgetter('best_performer', 'worst_performer')
+_COMPARISON_ROW_FORMAT = '{}: {} outperforms {}'.format
+
+# Recommendations included in every risk assessment
+_BASE_RECOMMENDATIONS = (
+    "Diversify portfolio to reduce concentration risk",
+    "Regular monitoring and rebalancing recommended"
+)
+
+# Static planning instructions, sent byte-identical on every call
+_PLANNING_SYSTEM_PROMPT = """
+Analyze the user's financial query and create a step-by-step analysis plan.
+
+Available tools:
+- search: Search through uploaded documents
+- calculate: Perform financial calculations
+- analyze_trends: Analyze trends in data
+- risk_assessment: Assess financial risks
+- compare: Compare different entities/periods
+- summarize: Summarize findings
+
+Create a JSON plan with steps like:
+[
+    {"step": 1, "tool": "search", "description": "Search for relevant financial data", "query": "specific search terms"},
+    {"step": 2, "tool": "calculate", "description": "Calculate key metrics", "inputs": ["data_needed"]},
+    ...
+]
+
+Focus on providing precise, data-driven analysis. Return only the JSON array.
+"""
+
+# Keyword triggers for fallback planning and calculations, matched against query terms
+_CALCULATE_TRIGGERS = frozenset({'calculate', 'ratio', 'metric', 'performance'})
+_TREND_TRIGGERS = frozenset({'trend', 'growth', 'change'})
+_RISK_TRIGGERS = frozenset({'risk', 'volatility', 'uncertainty'})
+_RATIO_TRIGGERS = frozenset({'ratio', 'pe', 'p/e', 'pb', 'roe', 'roa'})
+_GROWTH_TRIGGERS = frozenset({'growth', 'change', 'increase', 'decrease'})
+_STATISTICS_TRIGGERS = frozenset({'average', 'mean', 'median'})
+_RETURN_TRIGGERS = frozenset({'return', 'performance', 'yield'})
+_OVER_TIME_RE = re.compile(r'over\s+time', re.IGNORECASE)
+_TERM_RE = re.compile(r'[a-z/]+')
+
+def _query_terms(query: str) -> frozenset:
+    """Lowercase words of a query, with simple plurals also reduced to their singular"""
+    words = _TERM_RE.findall(query.lower())
+    return frozenset(words).union(word[:-1] for word in words if word.endswith('s'))
+
+def _extract_json_array(text: str) -> Optional[str]:
+    """Return the first balanced JSON array in text, scanning it once"""
+    start = text.find('[')
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    
+    return None
+
+class Trend(NamedTuple):
+    """Trend metrics for one time series"""
+    direction: str
+    volatility: float
+    recent_change: float
+    pattern: str
+
+class PlanCache:
+    """
+    Cache of analysis plans keyed by L2-normalized query embeddings.
+    Queries whose embedding is close enough to a cached one reuse its plan
+    instead of asking the LLM to plan again.
+    """
+    
+    def __init__(self, cache_path: str = "./plan_cache.pkl", threshold: float = 0.90):
+        self.cache_path = cache_path
+        self.threshold = threshold
+        self.embeddings = None  # np.float32 matrix, one normalized row per cached query
+        self.plans = []         # Plans parallel to the embedding rows
+        self.load()
+    
+    def lookup(self, embedding: np.ndarray) -> Optional[List[Dict]]:
+        """Return a copy of the closest cached plan if it clears the threshold"""
+        if not self.plans:
+            return None
+        
+        sims = self.embeddings @ embedding
+        best = int(np.argmax(sims))
+        if sims[best] > self.threshold:
+            return json.loads(json.dumps(self.plans[best]))
+        return None
+    
+    def add(self, embedding: np.ndarray, plan: List[Dict]):
+        """Add a plan to the cache unless a near-identical query is already cached"""
+        if not plan or self.lookup(embedding) is not None:
+            return
+        
+        row = embedding.astype(np.float32).reshape(1, -1)
+        self.embeddings = row if self.embeddings is None else np.vstack([self.embeddings, row])
+        self.plans.append(plan)
+        self.save()
+    
+    def load(self):
+        """Load cached plans from disk"""
+        try:
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, 'rb') as f:
+                    self.embeddings, self.plans = pickle.load(f)
+        except Exception as e:
+            print(f"Error loading plan cache: {e}")
+            self.embeddings, self.plans = None, []
+    
+    def save(self):
+        """Persist cached plans to disk"""
+        try:
+            with open(self.cache_path, 'wb') as f:
+                pickle.dump((self.embeddings, self.plans), f)
+        except Exception as e:
+            print(f"Error saving plan cache: {e}")
+
+class SemanticCache:
+    """
+    In-memory cache of full agent responses keyed by query embedding and
+    the hash of the document set the answer was produced from. Beyond
+    max_entries, the oldest entries are dropped.
+    """
+    
+    def __init__(self, threshold: float = 0.92, max_entries: int = 256):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embeddings = None  # np.float32 matrix, one normalized row per cached query
+        self.doc_hashes = []    # Document-set hash for each row
+        self.responses = []     # Response dicts parallel to the embedding rows
+        self._lock = threading.Lock()
+    
+    def lookup(self, embedding: np.ndarray, doc_hash: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the closest cached response for the same document set"""
+        with self._lock:
+            if not self.responses:
+                return None
+            
+            rows = np.flatnonzero(np.asarray(self.doc_hashes) == doc_hash)
+            if rows.size == 0:
+                return None
+            
+            sims = self.embeddings[rows] @ embedding
+            best = int(np.argmax(sims))
+            if sims[best] > self.threshold:
+                return dict(self.responses[rows[best]], cached=True)
+            return None
+    
+    def add(self, embedding: np.ndarray, doc_hash: str, response: Dict[str, Any]):
+        """Add a response to the cache"""
+        row = embedding.astype(np.float32).reshape(1, -1)
+        with self._lock:
+            self.embeddings = row if self.embeddings is None else np.vstack([self.embeddings, row])
+            self.doc_hashes.append(doc_hash)
+            self.responses.append(response)
+            if self.max_entries and len(self.responses) > self.max_entries:
+                excess = len(self.responses) - self.max_entries
+                self.embeddings = self.embeddings[excess:]
+                del self.doc_hashes[:excess]
+                del self.responses[:excess]
+    
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self.embeddings = None
+            self.doc_hashes = []
+            self.responses = []
 
 class FinancialAnalysisAgent:
     """
@@ -21,10 +255,31 @@ class FinancialAnalysisAgent:
     4. Provide structured insights
     """
     
-    def __init__(self, rag_pipeline, groq_client, max_processing_time=90):
+    def __init__(self, rag_pipeline, groq_client, max_processing_time=90,
+                 plan_cache_enabled=True, plan_cache_threshold=0.90,
+                 response_cache_enabled=True, response_cache_threshold=0.92,
+                 max_parallel_steps=4):
         self.rag_pipeline = rag_pipeline
         self.groq_client = groq_client
         self.max_processing_time = max_processing_time  # Maximum processing time in seconds
+        self.max_parallel_steps = max_parallel_steps  # Worker threads for independent plan steps
+        
+        # Semantic caching needs an embedding model; the simple keyword RAG has none
+        self.embedding_model = getattr(rag_pipeline, 'embedding_model', None)
+        has_embeddings = self.embedding_model is not None
+        self.plan_cache = PlanCache(threshold=plan_cache_threshold) if plan_cache_enabled and has_embeddings else None
+        self.response_cache = SemanticCache(threshold=response_cache_threshold) if response_cache_enabled and has_embeddings else None
+        
+        # Exact-match layer so repeated queries skip the embedding model entirely
+        self._embed_query = lru_cache(maxsize=256)(self._encode_query)
+        
+        # Numerical data per set of search documents, reset for every query
+        self._numerical_cache = {}
+        
+        # Content type and key metrics per retrieved chunk, shared across queries
+        self._content_cache = OrderedDict()
+        self._content_cache_lock = threading.Lock()
+        
         self.analysis_tools = {
             'search': self._search_documents,
             'calculate': self._perform_calculations,
@@ -34,22 +289,50 @@ class FinancialAnalysisAgent:
             'summarize': self._summarize_findings
         }
         
-    def process_query(self, user_query: str, context_data: Dict = None) -> Dict[str, Any]:
+        # Calculations and the query terms that trigger them
+        self.calculation_tools = (
+            (_RATIO_TRIGGERS, self._calculate_financial_ratios),
+            (_GROWTH_TRIGGERS, self._calculate_growth_metrics),
+            (_STATISTICS_TRIGGERS, self._calculate_statistical_metrics),
+            (_RETURN_TRIGGERS, self._calculate_return_metrics)
+        )
+        
+    def process_query(self, user_query: str, context_data: Dict = None, on_token: Callable[[str], None] = None) -> Dict[str, Any]:
         """
-        Main entry point for agentic RAG processing with timeout handling
+        Main entry point for agentic RAG processing with timeout handling.
+        If on_token is given, the summary is streamed to it as it is generated.
         """
         start_time = time.time()
+        self._numerical_cache = {}
         
         try:
+            query_embedding = None
+            if self.plan_cache or self.response_cache:
+                query_embedding = self._embed_query(user_query)
+            
+            # Answer near-duplicate questions over the same documents from cache
+            doc_hash = None
+            if self.response_cache:
+                try:
+                    doc_hash = self._document_set_hash(context_data)
+                except Exception:
+                    # Without a document identity a cached answer may be stale, so answer this query uncached
+                    doc_hash = None
+            if doc_hash is not None:
+                cached_response = self.response_cache.lookup(query_embedding, doc_hash)
+                if cached_response is not None:
+                    cached_response['processing_time'] = round(time.time() - start_time, 2)
+                    return cached_response
+            
             # Step 1: Analyze the query and create a plan
-            plan = self._create_analysis_plan(user_query, context_data)
+            plan, plan_is_new = self._create_analysis_plan(user_query, context_data, query_embedding)
             
             # Check timeout
             if time.time() - start_time > self.max_processing_time:
                 return self._timeout_response("Planning phase exceeded time limit")
             
             # Step 2: Execute the plan step by step
-            results = self._execute_plan(plan, user_query, context_data, start_time)
+            results = self._execute_plan(plan, user_query, context_data, start_time, on_token, query_embedding)
             
             # Check timeout
             if time.time() - start_time > self.max_processing_time:
@@ -60,7 +343,11 @@ class FinancialAnalysisAgent:
             
             processing_time = time.time() - start_time
             
-            return {
+            # Remember freshly planned queries; fallback plans are not cached so an LLM outage does not outlive itself
+            if self.plan_cache and plan_is_new:
+                self.plan_cache.add(query_embedding, plan)
+            
+            response = {
                 'success': True,
                 'answer': final_answer,
                 'plan': plan,
@@ -70,6 +357,11 @@ class FinancialAnalysisAgent:
                 'processing_time': round(processing_time, 2)
             }
             
+            if doc_hash is not None:
+                self.response_cache.add(query_embedding, doc_hash, response)
+            
+            return response
+            
         except Exception as e:
             return {
                 'success': False,
@@ -78,6 +370,69 @@ class FinancialAnalysisAgent:
                 'processing_time': round(time.time() - start_time, 2)
             }
     
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Embed and L2-normalize a query"""
+        vector = np.asarray(self.embedding_model.encode(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _document_set_hash(self, context_data: Dict = None) -> str:
+        """Fingerprint the documents in the knowledge base and the session data passed with the query"""
+        # Deferred so importing the agent does not load pandas; any DataFrame in the context has already loaded it
+        import pandas as pd
+        
+        fingerprint = getattr(self.rag_pipeline, 'document_fingerprint', None)
+        if fingerprint:
+            documents = fingerprint()
+        else:
+            # Pipelines without chunk identities can only be told apart by size
+            documents = str(self.rag_pipeline.get_collection_stats().get('total_documents', 0))
+        
+        digest = hashlib.blake2b(documents.encode(), digest_size=16)
+        for key in sorted(context_data or {}):
+            value = context_data[key]
+            digest.update(key.encode() + b'\0')
+            if isinstance(value, pd.DataFrame):
+                digest.update(repr(list(value.columns)).encode())
+                try:
+                    digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+                except TypeError:
+                    # Unhashable cells such as lists
+                    digest.update(repr(value.to_dict()).encode('utf-8'))
+            elif isinstance(value, str):
+                digest.update(value.encode('utf-8'))
+            else:
+                digest.update(repr(value).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def process_query_stream(self, user_query: str, context_data: Dict = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_query. Yields partial answers (marked
+        'partial': True) while the summary is generated, then the final result.
+        """
+        tokens = queue.Queue()
+        outcome = {}
+        
+        def run():
+            try:
+                outcome['result'] = self.process_query(user_query, context_data, on_token=tokens.put)
+            finally:
+                tokens.put(None)
+        
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True)
+        worker.start()
+        
+        answer = ""
+        while True:
+            token = tokens.get()
+            if token is None:
+                break
+            answer += token
+            yield {'success': True, 'partial': True, 'answer': answer}
+        
+        worker.join()
+        yield outcome['result']
+    
     def _timeout_response(self, reason: str) -> Dict[str, Any]:
         """Generate a timeout response"""
         return {
@@ -87,59 +442,66 @@ class FinancialAnalysisAgent:
             'timeout': True
         }
     
-    def _create_analysis_plan(self, query: str, context_data: Dict = None) -> List[Dict]:
+    def _create_analysis_plan(self, query: str, context_data: Dict = None, query_embedding: np.ndarray = None) -> Tuple[List[Dict], bool]:
         """
-        Create a step-by-step analysis plan based on the query
+        Create a step-by-step analysis plan based on the query.
+        Returns (plan, whether the plan was just produced by the LLM and is worth caching).
         """
-        # Use LLM to understand the query and create a plan
-        planning_prompt = f"""
-        Analyze this financial query and create a step-by-step analysis plan.
+        # Reuse a cached plan for a semantically similar query when available
+        if query_embedding is not None and self.plan_cache is not None:
+            cached_plan = self.plan_cache.lookup(query_embedding)
+            if cached_plan is not None:
+                return cached_plan, False
         
-        Query: {query}
-        
-        Available tools:
-        - search: Search through uploaded documents
-        - calculate: Perform financial calculations
-        - analyze_trends: Analyze trends in data
-        - risk_assessment: Assess financial risks
-        - compare: Compare different entities/periods
-        - summarize: Summarize findings
-        
-        Available context data: {list(context_data.keys()) if context_data else 'None'}
-        
-        Create a JSON plan with steps like:
-        [
-            {{"step": 1, "tool": "search", "description": "Search for relevant financial data", "query": "specific search terms"}},
-            {{"step": 2, "tool": "calculate", "description": "Calculate key metrics", "inputs": ["data_needed"]}},
-            ...
-        ]
-        
-        Focus on providing precise, data-driven analysis. Return only the JSON array.
-        """
+        # Use LLM to understand the query and create a plan. Only the user turn
+        # varies between calls so the system prompt stays a cacheable prefix.
+        user_prompt = (
+            f"Query: {query}\n"
+            f"Available context data: {list(context_data.keys()) if context_data else 'None'}"
+        )
         
         try:
             response = self.groq_client.chat.completions.create(
                 model="llama3-8b-8192",
-                messages=[{"role": "user", "content": planning_prompt}],
+                messages=[
+                    {"role": "system", "content": _PLANNING_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
                 temperature=0.1,
                 max_tokens=500,  # Reduced for faster response
-                timeout=10  # 10 second timeout for planning
+                timeout=10,  # 10 second timeout for planning
+                stream=True
             )
             
-            plan_text = response.choices[0].message.content.strip()
+            # Stop reading as soon as the plan array is complete
+            plan_text = ""
+            plan_json = None
+            try:
+                for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    plan_text += delta
+                    if ']' in delta:
+                        plan_json = _extract_json_array(plan_text)
+                        if plan_json:
+                            break
+            finally:
+                # Closing the stream early stops paying for trailing tokens
+                close = getattr(response, 'close', None)
+                if close:
+                    close()
             
-            # Extract JSON from response
-            json_match = re.search(r'\[.*\]', plan_text, re.DOTALL)
-            if json_match:
-                plan = json.loads(json_match.group())
-                return plan
+            if plan_json:
+                plan = _json_loads(plan_json)
+                return plan, True
             else:
                 # Fallback plan
-                return self._create_fallback_plan(query)
+                return self._create_fallback_plan(query), False
                 
         except Exception as e:
             print(f"Error creating plan: {e}")
-            return self._create_fallback_plan(query)
+            return self._create_fallback_plan(query), False
     
     def _create_fallback_plan(self, query: str) -> List[Dict]:
         """
@@ -151,13 +513,14 @@ class FinancialAnalysisAgent:
         ]
         
         # Add specific steps based on query content
-        if any(keyword in query.lower() for keyword in ['calculate', 'ratio', 'metric', 'performance']):
+        terms = _query_terms(query)
+        if terms & _CALCULATE_TRIGGERS:
             plan.insert(1, {"step": 2, "tool": "calculate", "description": "Perform calculations", "inputs": ["search_results"]})
         
-        if any(keyword in query.lower() for keyword in ['trend', 'growth', 'change', 'over time']):
+        if terms & _TREND_TRIGGERS or _OVER_TIME_RE.search(query):
             plan.insert(-1, {"step": len(plan), "tool": "analyze_trends", "description": "Analyze trends", "inputs": ["search_results"]})
         
-        if any(keyword in query.lower() for keyword in ['risk', 'volatility', 'uncertainty']):
+        if terms & _RISK_TRIGGERS:
             plan.insert(-1, {"step": len(plan), "tool": "risk_assessment", "description": "Assess risks", "inputs": ["search_results"]})
         
         # Renumber steps
@@ -166,288 +529,358 @@ class FinancialAnalysisAgent:
             
         return plan
     
-    def _execute_plan(self, plan: List[Dict], original_query: str, context_data: Dict = None, start_time: float = None) -> Dict[str, Any]:
+    def _execute_plan(self, plan: List[Dict], original_query: str, context_data: Dict = None, start_time: float = None,
+                      on_token: Callable[[str], None] = None, query_embedding: np.ndarray = None) -> Dict[str, Any]:
         """
-        Execute the analysis plan step by step with timeout handling
+        Execute the analysis plan with timeout handling, running steps whose
+        inputs are already available in parallel
         """
         results = {'steps': {}}
-        accumulated_data = {}
+        sources = {}  # Insertion-ordered set of sources seen so far
+        dependencies = self._plan_dependencies(plan)
+        step_results = {}  # Plan index -> step result
+        pending = list(range(len(plan)))
+        running = {}  # Future -> plan index
+        timed_out_at = None
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel_steps)
+        try:
+            while pending or running:
+                # Check timeout before scheduling more work
+                if start_time and time.time() - start_time > self.max_processing_time:
+                    timed_out_at = min(pending + list(running.values()))
+                    break
+                
+                # Submit every step whose dependencies have finished
+                for index in [i for i in pending if all(d in step_results for d in dependencies[i])]:
+                    pending.remove(index)
+                    accumulated_data = {
+                        f'step_{plan[d]["step"]}': step_results[d]['result']
+                        for d in dependencies[index] if step_results[d]['success']
+                    }
+                    # Copy the caller's context so per-request state follows the step into the worker
+                    future = executor.submit(
+                        contextvars.copy_context().run,
+                        self._run_step, plan[index], original_query, context_data, accumulated_data, on_token, query_embedding
+                    )
+                    running[future] = index
+                
+                remaining = None
+                if start_time:
+                    remaining = max(self.max_processing_time - (time.time() - start_time), 0)
+                done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step_result = future.result()
+                    step_results[running.pop(future)] = step_result
+                    sources.update(dict.fromkeys(self._step_sources(step_result)))
+        finally:
+            # Steps still running after a timeout finish in the background and are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        for step in plan:
-            # Check timeout before each step
-            if start_time and time.time() - start_time > self.max_processing_time:
+        # Report steps in plan order
+        for index, step in enumerate(plan):
+            if index in step_results:
+                results['steps'][step['step']] = step_results[index]
+            elif index == timed_out_at:
                 results['steps'][f'timeout_at_step_{step["step"]}'] = {
                     'tool': 'timeout',
                     'description': 'Processing stopped due to timeout',
                     'result': 'Timeout reached during execution',
                     'success': False
                 }
-                break
-                
-            step_num = step['step']
-            tool = step['tool']
-            
-            try:
-                if tool in self.analysis_tools:
-                    # Prepare inputs for the tool
-                    if tool == 'search':
-                        search_query = step.get('query', original_query)
-                        result = self.analysis_tools[tool](search_query)
-                    else:
-                        # Use accumulated data and context
-                        inputs = {
-                            'query': original_query,
-                            'step_config': step,
-                            'accumulated_data': accumulated_data,
-                            'context_data': context_data or {}
-                        }
-                        result = self.analysis_tools[tool](inputs)
-                    
-                    results['steps'][step_num] = {
-                        'tool': tool,
-                        'description': step['description'],
-                        'result': result,
-                        'success': True
-                    }
-                    
-                    # Accumulate data for next steps
-                    accumulated_data[f'step_{step_num}'] = result
-                    
-                else:
-                    results['steps'][step_num] = {
-                        'tool': tool,
-                        'description': step['description'],
-                        'result': f"Tool '{tool}' not available",
-                        'success': False
-                    }
-                    
-            except Exception as e:
-                results['steps'][step_num] = {
-                    'tool': tool,
-                    'description': step['description'],
-                    'result': f"Error: {str(e)}",
-                    'success': False
-                }
         
+        results['sources'] = list(sources)
         return results
     
-    def _search_documents(self, query: str) -> Dict[str, Any]:
+    def _plan_dependencies(self, plan: List[Dict]) -> List[List[int]]:
         """
-        Enhanced document search with intelligent result processing
+        Map each plan step to the indices of the earlier steps it reads from.
+        Searches need nothing, analysis tools read the search output and
+        summarize reads everything before it.
+        """
+        dependencies = []
+        for index, step in enumerate(plan):
+            tool = step['tool']
+            if tool == 'search':
+                dependencies.append([])
+            elif tool == 'summarize':
+                dependencies.append(list(range(index)))
+            else:
+                dependencies.append([i for i in range(index) if plan[i]['tool'] == 'search'])
+        return dependencies
+    
+    def _run_step(self, step: Dict, original_query: str, context_data: Dict, accumulated_data: Dict,
+                  on_token: Callable[[str], None] = None, query_embedding: np.ndarray = None) -> Dict[str, Any]:
         """
+        Run a single plan step and wrap its outcome. Tools report expected
+        failures in their return value; this is the only place that catches
+        unexpected exceptions.
+        """
+        tool = step['tool']
+        tool_fn = self.analysis_tools.get(tool)
+        
+        if tool_fn is None:
+            return {
+                'tool': tool,
+                'description': step['description'],
+                'result': f"Tool '{tool}' not available",
+                'success': False
+            }
+        
         try:
-            # Get search results
-            raw_results = self.rag_pipeline.search_documents(query, n_results=10)
-            
-            if not raw_results or 'error' in raw_results[0]:
-                return {'documents': [], 'summary': 'No relevant documents found'}
-            
-            # Process and enhance results
-            processed_results = []
-            for result in raw_results:
-                processed_result = {
-                    'content': result['content'],
-                    'source': result['metadata'].get('filename', 'Unknown'),
-                    'relevance': result['relevance_score'],
-                    'type': self._detect_content_type(result['content']),
-                    'key_metrics': self._extract_key_metrics(result['content'])
+            # Prepare inputs for the tool
+            if tool == 'search':
+                search_query = step.get('query', original_query)
+                # The user query is already embedded; reuse it when the step searches for the same text
+                if search_query == original_query and query_embedding is not None:
+                    result = tool_fn(search_query, query_embedding)
+                else:
+                    result = tool_fn(search_query)
+            else:
+                # Use accumulated data and context
+                inputs = {
+                    'query': original_query,
+                    'step_config': step,
+                    'accumulated_data': accumulated_data,
+                    'context_data': context_data or {},
+                    'on_token': on_token
                 }
-                processed_results.append(processed_result)
-            
-            # Create summary
-            summary = self._create_search_summary(processed_results, query)
+                result = tool_fn(inputs)
             
             return {
-                'documents': processed_results,
-                'summary': summary,
-                'total_found': len(processed_results)
+                'tool': tool,
+                'description': step['description'],
+                'result': result,
+                'success': True
             }
             
         except Exception as e:
-            return {'error': str(e), 'documents': []}
+            return {
+                'tool': tool,
+                'description': step['description'],
+                'result': f"Error: {str(e)}",
+                'success': False
+            }
+    
+    def _search_documents(self, query: str, query_embedding: np.ndarray = None) -> Dict[str, Any]:
+        """
+        Enhanced document search with intelligent result processing
+        """
+        # Get search results
+        if query_embedding is not None:
+            raw_results = self.rag_pipeline.search_documents(query, n_results=10, query_embedding=query_embedding)
+        else:
+            raw_results = self.rag_pipeline.search_documents(query, n_results=10)
+        
+        if not raw_results or 'error' in raw_results[0]:
+            return {'documents': [], 'summary': 'No relevant documents found'}
+        
+        # Process and enhance results, reusing features of chunks seen before
+        contents = [result['content'] for result in raw_results]
+        features = self._content_features(contents)
+        
+        processed_results = [
+            {
+                'content': content,
+                'source': result['metadata'].get('filename', 'Unknown'),
+                'relevance': result['relevance_score'],
+                'type': content_type,
+                'key_metrics': dict(key_metrics)
+            }
+            for result, content, (content_type, key_metrics) in zip(raw_results, contents, features)
+        ]
+        
+        # Create summary
+        relevances = np.fromiter((result['relevance_score'] for result in raw_results), dtype=np.float32, count=len(raw_results))
+        summary = self._create_search_summary(processed_results, query, relevances)
+        
+        return {
+            'documents': processed_results,
+            'summary': summary,
+            'total_found': len(processed_results)
+        }
     
     def _perform_calculations(self, inputs: Dict) -> Dict[str, Any]:
         """
         Perform financial calculations on the data
         """
-        try:
-            accumulated_data = inputs.get('accumulated_data', {})
-            query = inputs.get('query', '')
-            
-            calculations = {}
-            
-            # Extract numerical data from search results
-            numerical_data = self._extract_numerical_data(accumulated_data)
-            
-            if numerical_data:
-                # Common financial calculations
-                if any(term in query.lower() for term in ['ratio', 'pe', 'pb', 'roe', 'roa']):
-                    calculations.update(self._calculate_financial_ratios(numerical_data))
-                
-                if any(term in query.lower() for term in ['growth', 'change', 'increase', 'decrease']):
-                    calculations.update(self._calculate_growth_metrics(numerical_data))
-                
-                if any(term in query.lower() for term in ['average', 'mean', 'median']):
-                    calculations.update(self._calculate_statistical_metrics(numerical_data))
-                
-                if any(term in query.lower() for term in ['return', 'performance', 'yield']):
-                    calculations.update(self._calculate_return_metrics(numerical_data))
-            
-            return {
-                'calculations': calculations,
-                'data_used': list(numerical_data.keys()) if numerical_data else [],
-                'insights': self._generate_calculation_insights(calculations)
-            }
-            
-        except Exception as e:
-            return {'error': str(e), 'calculations': {}}
+        accumulated_data = inputs.get('accumulated_data', {})
+        query = inputs.get('query', '')
+        
+        calculations = {}
+        
+        # Extract numerical data from search results
+        numerical_data = self._extract_numerical_data(accumulated_data)
+        
+        if numerical_data:
+            # Common financial calculations requested by the query
+            terms = _query_terms(query)
+            for triggers, calculate in self.calculation_tools:
+                if terms & triggers:
+                    calculations.update(calculate(numerical_data))
+        
+        return {
+            'calculations': calculations,
+            'data_used': list(numerical_data.keys()) if numerical_data else [],
+            'insights': self._generate_calculation_insights(calculations)
+        }
     
     def _analyze_trends(self, inputs: Dict) -> Dict[str, Any]:
         """
         Analyze trends in the data
         """
-        try:
-            accumulated_data = inputs.get('accumulated_data', {})
-            
-            trends = {}
-            
-            # Extract time series data
-            time_series_data = self._extract_time_series_data(accumulated_data)
-            
-            for metric, data in time_series_data.items():
-                if len(data) >= 2:
-                    trend_analysis = {
-                        'direction': self._determine_trend_direction(data),
-                        'volatility': self._calculate_volatility(data),
-                        'recent_change': self._calculate_recent_change(data),
-                        'pattern': self._identify_pattern(data)
-                    }
-                    trends[metric] = trend_analysis
-            
-            return {
-                'trends': trends,
-                'summary': self._create_trend_summary(trends)
-            }
-            
-        except Exception as e:
-            return {'error': str(e), 'trends': {}}
+        accumulated_data = inputs.get('accumulated_data', {})
+        
+        # Extract time series data
+        time_series_data = self._extract_time_series_data(accumulated_data)
+        if not time_series_data:
+            return {'trends': {}, 'summary': "No trend data available."}
+        
+        metric_names, series = [], []
+        add_name, add_series = metric_names.append, series.append
+        for metric, data in time_series_data.items():
+            values = calc_kernels.as_float_array(data)
+            if values.size >= 2:
+                add_name(metric)
+                add_series(values)
+        
+        if not metric_names:
+            return {'trends': {}, 'summary': "No trend data available."}
+        
+        # One kernel call covers every series
+        lengths = np.fromiter(map(len, series), dtype=np.intp, count=len(series))
+        signs, volatilities, recent_changes, patterns = calc_kernels.series_trends(np.concatenate(series), lengths)
+        
+        trends = {
+            metric: Trend(_TREND_DIRECTIONS[sign], volatility, recent_change, _PATTERN_LABELS[pattern])
+            for metric, sign, volatility, recent_change, pattern in zip(
+                metric_names, signs.tolist(), volatilities.tolist(), recent_changes.tolist(), patterns.tolist()
+            )
+        }
+        
+        return {
+            'trends': trends,
+            'summary': self._create_trend_summary(np.array(metric_names, dtype=str), signs)
+        }
     
     def _assess_risk(self, inputs: Dict) -> Dict[str, Any]:
         """
         Assess financial risks
         """
-        try:
-            accumulated_data = inputs.get('accumulated_data', {})
-            
-            risk_assessment = {
-                'market_risk': 'Medium',  # Placeholder
-                'credit_risk': 'Low',     # Placeholder
-                'liquidity_risk': 'Low',  # Placeholder
-                'operational_risk': 'Medium'  # Placeholder
-            }
-            
-            # Extract relevant data for risk assessment
-            numerical_data = self._extract_numerical_data(accumulated_data)
-            
-            if numerical_data:
-                # Calculate risk metrics
-                volatility_metrics = self._calculate_risk_metrics(numerical_data)
-                risk_assessment.update(volatility_metrics)
-            
-            return {
-                'risk_assessment': risk_assessment,
-                'recommendations': self._generate_risk_recommendations(risk_assessment)
-            }
-            
-        except Exception as e:
-            return {'error': str(e), 'risk_assessment': {}}
+        accumulated_data = inputs.get('accumulated_data', {})
+        
+        risk_assessment = {
+            'market_risk': 'Medium',  # Placeholder
+            'credit_risk': 'Low',     # Placeholder
+            'liquidity_risk': 'Low',  # Placeholder
+            'operational_risk': 'Medium'  # Placeholder
+        }
+        
+        # Extract relevant data for risk assessment
+        numerical_data = self._extract_numerical_data(accumulated_data)
+        
+        if numerical_data:
+            # Calculate risk metrics
+            volatility_metrics = self._calculate_risk_metrics(numerical_data)
+            risk_assessment.update(volatility_metrics)
+        
+        return {
+            'risk_assessment': risk_assessment,
+            'recommendations': self._generate_risk_recommendations(risk_assessment)
+        }
     
     def _compare_entities(self, inputs: Dict) -> Dict[str, Any]:
         """
         Compare different entities or time periods
         """
-        try:
-            accumulated_data = inputs.get('accumulated_data', {})
-            
-            # Extract comparable data
-            comparison_data = self._extract_comparison_data(accumulated_data)
-            
-            comparisons = {}
-            if comparison_data:
-                for metric, values in comparison_data.items():
-                    if len(values) >= 2:
-                        comparisons[metric] = {
-                            'values': values,
-                            'best_performer': max(values, key=lambda x: x['value'])['entity'],
-                            'worst_performer': min(values, key=lambda x: x['value'])['entity'],
-                            'average': np.mean([v['value'] for v in values]),
-                            'spread': max([v['value'] for v in values]) - min([v['value'] for v in values])
-                        }
-            
-            return {
-                'comparisons': comparisons,
-                'summary': self._create_comparison_summary(comparisons)
-            }
-            
-        except Exception as e:
-            return {'error': str(e), 'comparisons': {}}
+        accumulated_data = inputs.get('accumulated_data', {})
+        
+        # Extract comparable data
+        comparison_data = self._extract_comparison_data(accumulated_data)
+        if not comparison_data:
+            return {'comparisons': {}, 'summary': "No comparison data available."}
+        
+        comparisons = {}
+        for metric, (values, entities) in comparison_data.items():
+            if values.size >= 2:
+                comparisons[metric] = {
+                    'values': values.tolist(),
+                    'entities': entities.tolist(),
+                    'best_performer': entities[values.argmax()],
+                    'worst_performer': entities[values.argmin()],
+                    'average': float(values.mean()),
+                    'spread': float(np.ptp(values))
+                }
+        
+        return {
+            'comparisons': comparisons,
+            'summary': self._create_comparison_summary(comparisons)
+        }
     
     def _summarize_findings(self, inputs: Dict) -> Dict[str, Any]:
         """
         Summarize all findings into a coherent response
         """
+        accumulated_data = inputs.get('accumulated_data', {})
+        query = inputs.get('query', '')
+        
+        # Extract key findings from all steps
+        key_findings = []
+        sources = []
+        
+        for step_key, step_data in accumulated_data.items():
+            if isinstance(step_data, dict):
+                if 'summary' in step_data:
+                    key_findings.append(step_data['summary'])
+                if 'documents' in step_data:
+                    sources.extend([doc['source'] for doc in step_data['documents']])
+                if 'calculations' in step_data and step_data['calculations']:
+                    key_findings.append(f"Key calculations: {list(step_data['calculations'].keys())}")
+        
+        # Generate comprehensive summary using LLM
+        summary_prompt = f"""
+        Based on the financial analysis conducted, provide a comprehensive summary for this query:
+        
+        Query: {query}
+        
+        Key Findings:
+        {chr(10).join(f"- {finding}" for finding in key_findings)}
+        
+        Sources: {', '.join(set(sources))}
+        
+        Provide a clear, structured summary that directly answers the user's question with specific data points and insights.
+        """
+        
         try:
-            accumulated_data = inputs.get('accumulated_data', {})
-            query = inputs.get('query', '')
-            
-            # Extract key findings from all steps
-            key_findings = []
-            sources = []
-            
-            for step_key, step_data in accumulated_data.items():
-                if isinstance(step_data, dict):
-                    if 'summary' in step_data:
-                        key_findings.append(step_data['summary'])
-                    if 'documents' in step_data:
-                        sources.extend([doc['source'] for doc in step_data['documents']])
-                    if 'calculations' in step_data and step_data['calculations']:
-                        key_findings.append(f"Key calculations: {list(step_data['calculations'].keys())}")
-            
-            # Generate comprehensive summary using LLM
-            summary_prompt = f"""
-            Based on the financial analysis conducted, provide a comprehensive summary for this query:
-            
-            Query: {query}
-            
-            Key Findings:
-            {chr(10).join(f"- {finding}" for finding in key_findings)}
-            
-            Sources: {', '.join(set(sources))}
-            
-            Provide a clear, structured summary that directly answers the user's question with specific data points and insights.
-            """
+            on_token = inputs.get('on_token')
+            response = self.groq_client.chat.completions.create(
+                model="llama3-8b-8192",
+                messages=[{"role": "user", "content": summary_prompt}],
+                temperature=0.2,
+                max_tokens=1500,
+                stream=on_token is not None
+            )
             
-            try:
-                response = self.groq_client.chat.completions.create(
-                    model="llama3-8b-8192",
-                    messages=[{"role": "user", "content": summary_prompt}],
-                    temperature=0.2,
-                    max_tokens=1500
-                )
-                
+            if on_token is not None:
+                # Forward tokens as they arrive so callers can render early
+                parts = []
+                for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_token(delta)
+                summary = "".join(parts).strip()
+            else:
                 summary = response.choices[0].message.content.strip()
-                
-            except Exception as e:
-                summary = f"Summary of findings: {'. '.join(key_findings)}"
-            
-            return {
-                'summary': summary,
-                'key_findings': key_findings,
-                'sources_used': list(set(sources))
-            }
             
         except Exception as e:
-            return {'error': str(e), 'summary': 'Could not generate summary'}
+            summary = f"Summary of findings: {'. '.join(key_findings)}"
+        
+        return {
+            'summary': summary,
+            'key_findings': key_findings,
+            'sources_used': list(set(sources))
+        }
     
     def _synthesize_answer(self, query: str, plan: List[Dict], results: Dict) -> str:
         """
@@ -501,24 +934,26 @@ class FinancialAnalysisAgent:
         """
         try:
             total_steps = len(results['steps'])
-            successful_steps = sum(1 for step in results['steps'].values() if step['success'])
-            
             if total_steps == 0:
                 return 0.0
             
-            base_confidence = successful_steps / total_steps
-            
-            # Adjust based on data quality
+            # Count successes and adjust for data quality in one pass
+            successful_steps = 0
             data_quality_bonus = 0.0
             for step_result in results['steps'].values():
-                if step_result['success'] and isinstance(step_result['result'], dict):
-                    if 'documents' in step_result['result']:
-                        docs = step_result['result']['documents']
-                        if docs and len(docs) > 0:
-                            avg_relevance = np.mean([doc.get('relevance', 0) for doc in docs])
-                            data_quality_bonus += avg_relevance * 0.2
+                if not step_result['success']:
+                    continue
+                successful_steps += 1
+                
+                result = step_result['result']
+                docs = result.get('documents') if isinstance(result, dict) else None
+                if docs:
+                    relevance_sum = 0.0
+                    for doc in docs:
+                        relevance_sum += doc.get('relevance', 0)
+                    data_quality_bonus += relevance_sum / len(docs) * 0.2
             
-            return min(base_confidence + data_quality_bonus, 1.0)
+            return min(successful_steps / total_steps + data_quality_bonus, 1.0)
             
         except Exception:
             return 0.5  # Default confidence
@@ -527,56 +962,102 @@ class FinancialAnalysisAgent:
         """
         Extract all sources used in the analysis
         """
-        sources = set()
+        # Sources are collected while the plan executes
+        if 'sources' in results:
+            return results['sources']
         
+        sources = set()
         for step_result in results['steps'].values():
-            if step_result['success'] and isinstance(step_result['result'], dict):
-                if 'documents' in step_result['result']:
-                    for doc in step_result['result']['documents']:
-                        if 'source' in doc:
-                            sources.add(doc['source'])
-                
-                if 'sources_used' in step_result['result']:
-                    sources.update(step_result['result']['sources_used'])
-        
+            sources.update(self._step_sources(step_result))
         return list(sources)
     
+    def _step_sources(self, step_result: Dict) -> List[str]:
+        """Sources referenced by a single step result"""
+        sources = []
+        if step_result['success'] and isinstance(step_result['result'], dict):
+            if 'documents' in step_result['result']:
+                for doc in step_result['result']['documents']:
+                    if 'source' in doc:
+                        sources.append(doc['source'])
+            
+            if 'sources_used' in step_result['result']:
+                sources.extend(step_result['result']['sources_used'])
+        
+        return sources
+    
     # Helper methods for data extraction and analysis
     def _detect_content_type(self, content: str) -> str:
         """Detect the type of content (numerical, text, structured, etc.)"""
-        if any(delimiter in content for delimiter in [',', '\t', '|']) and '\n' in content:
+        flags = calc_kernels.content_flags(content)
+        structured = calc_kernels.CONTENT_HAS_DELIMITER | calc_kernels.CONTENT_HAS_NEWLINE
+        if flags & structured == structured:
             return 'structured_data'
-        elif re.search(r'\d+\.?\d*', content):
+        elif flags & calc_kernels.CONTENT_HAS_DIGIT:
             return 'numerical'
         else:
             return 'text'
     
-    def _extract_key_metrics(self, content: str) -> Dict[str, float]:
-        """Extract numerical metrics from content"""
-        metrics = {}
-        
-        # Look for common financial patterns
-        patterns = {
-            'revenue': r'revenue[:\s]+\$?(\d+(?:,\d{3})*(?:\.\d+)?)',
-            'profit': r'profit[:\s]+\$?(\d+(?:,\d{3})*(?:\.\d+)?)',
-            'pe_ratio': r'p/e[:\s]+(\d+(?:\.\d+)?)',
-            'price': r'price[:\s]+\$?(\d+(?:\.\d+)?)',
-            'volume': r'volume[:\s]+(\d+(?:,\d{3})*)',
-        }
+    def _content_features(self, contents: List[str]) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        Content type and key metrics for each content. Chunks are re-retrieved
+        across queries, so results are kept in a bounded LRU keyed by content;
+        only the misses go through detection and one batched metric sweep.
+        """
+        with self._content_cache_lock:
+            features = []
+            for content in contents:
+                cached = self._content_cache.get(content)
+                if cached is not None:
+                    self._content_cache.move_to_end(content)
+                features.append(cached)
         
-        for metric, pattern in patterns.items():
-            match = re.search(pattern, content.lower())
-            if match:
-                try:
-                    value = float(match.group(1).replace(',', ''))
-                    metrics[metric] = value
-                except ValueError:
-                    continue
+        misses = [i for i, cached in enumerate(features) if cached is None]
+        if misses:
+            metrics_per_content = self._extract_key_metrics_batch([contents[i] for i in misses])
+            with self._content_cache_lock:
+                for i, key_metrics in zip(misses, metrics_per_content):
+                    features[i] = (self._detect_content_type(contents[i]), key_metrics)
+                    self._content_cache[contents[i]] = features[i]
+                while len(self._content_cache) > _CONTENT_CACHE_SIZE:
+                    self._content_cache.popitem(last=False)
+        
+        return features
+    
+    def _extract_key_metrics_batch(self, contents: List[str]) -> List[Dict[str, float]]:
+        """Extract numerical metrics from several contents with a single regex sweep"""
+        metrics_per_content = [{} for _ in contents]
+        
+        # Start offset of each content inside the joined text
+        offsets = []
+        position = 0
+        for content in contents:
+            offsets.append(position)
+            position += len(content) + 1
+        
+        # Keep the first value seen for each metric within each content
+        for match in _METRIC_RE.finditer("\x00".join(contents)):
+            metrics = metrics_per_content[bisect.bisect_right(offsets, match.start()) - 1]
+            metric = match.lastgroup
+            if metric in metrics:
+                continue
+            try:
+                metrics[metric] = float(match.group(metric).replace(',', ''))
+            except ValueError:
+                continue
         
-        return metrics
+        return metrics_per_content
     
     def _extract_numerical_data(self, accumulated_data: Dict) -> Dict[str, List]:
         """Extract numerical data from accumulated results"""
+        # Several tools read the same search documents; reuse the extraction per document set
+        cache_key = tuple(
+            (id(step_data['documents']), len(step_data['documents']))
+            for step_data in accumulated_data.values()
+            if isinstance(step_data, dict) and 'documents' in step_data
+        )
+        if cache_key in self._numerical_cache:
+            return self._numerical_cache[cache_key]
+        
         numerical_data = {}
         
         for step_key, step_data in accumulated_data.items():
@@ -588,6 +1069,7 @@ class FinancialAnalysisAgent:
                                 numerical_data[metric] = []
                             numerical_data[metric].append(value)
         
+        self._numerical_cache[cache_key] = numerical_data
         return numerical_data
     
     def _extract_time_series_data(self, accumulated_data: Dict) -> Dict[str, List]:
@@ -615,8 +1097,7 @@ class FinancialAnalysisAgent:
         
         for metric, values in data.items():
             if len(values) >= 2:
-                growth_rate = ((values[-1] - values[0]) / values[0]) * 100
-                growth_metrics[f'{metric}_growth'] = growth_rate
+                growth_metrics[f'{metric}_growth'] = float(calc_kernels.growth_rate(calc_kernels.as_float_array(values)))
         
         return growth_metrics
     
@@ -626,10 +1107,11 @@ class FinancialAnalysisAgent:
         
         for metric, values in data.items():
             if values:
-                stats[f'{metric}_mean'] = np.mean(values)
-                stats[f'{metric}_median'] = np.median(values)
+                mean, median, std = calc_kernels.summary_stats(calc_kernels.as_float_array(values))
+                stats[f'{metric}_mean'] = float(mean)
+                stats[f'{metric}_median'] = float(median)
                 if len(values) > 1:
-                    stats[f'{metric}_std'] = np.std(values)
+                    stats[f'{metric}_std'] = float(std)
         
         return stats
     
@@ -640,8 +1122,7 @@ class FinancialAnalysisAgent:
         if 'price' in data:
             prices = data['price']
             if len(prices) >= 2:
-                total_return = ((prices[-1] - prices[0]) / prices[0]) * 100
-                return_metrics['total_return'] = total_return
+                return_metrics['total_return'] = float(calc_kernels.growth_rate(calc_kernels.as_float_array(prices)))
         
         return return_metrics
     
@@ -662,115 +1143,84 @@ class FinancialAnalysisAgent:
         
         return insights
     
-    def _determine_trend_direction(self, data: List) -> str:
-        """Determine trend direction"""
-        if len(data) < 2:
-            return 'insufficient_data'
-        
-        if data[-1] > data[0]:
-            return 'upward'
-        elif data[-1] < data[0]:
-            return 'downward'
-        else:
-            return 'stable'
-    
-    def _calculate_volatility(self, data: List) -> float:
-        """Calculate volatility"""
-        if len(data) < 2:
-            return 0.0
-        return np.std(data) / np.mean(data) if np.mean(data) != 0 else 0.0
-    
-    def _calculate_recent_change(self, data: List) -> float:
-        """Calculate recent change percentage"""
-        if len(data) < 2:
-            return 0.0
-        return ((data[-1] - data[-2]) / data[-2]) * 100 if data[-2] != 0 else 0.0
-    
-    def _identify_pattern(self, data: List) -> str:
-        """Identify patterns in data"""
-        # Simplified pattern identification
-        if len(data) < 3:
-            return 'insufficient_data'
-        
-        # Check for consistent growth
-        if all(data[i] <= data[i+1] for i in range(len(data)-1)):
-            return 'consistent_growth'
-        elif all(data[i] >= data[i+1] for i in range(len(data)-1)):
-            return 'consistent_decline'
-        else:
-            return 'volatile'
-    
-    def _create_search_summary(self, results: List, query: str) -> str:
+    def _create_search_summary(self, results: List, query: str, relevances: np.ndarray = None) -> str:
         """Create summary of search results"""
         if not results:
             return "No relevant documents found."
         
-        high_relevance = [r for r in results if r['relevance'] > 0.7]
+        if relevances is None:
+            relevances = np.fromiter((r['relevance'] for r in results), dtype=np.float32, count=len(results))
+        high_relevance_count = int((relevances > 0.7).sum())
         
-        if high_relevance:
-            return f"Found {len(high_relevance)} highly relevant documents containing information about {query}."
+        if high_relevance_count:
+            return f"Found {high_relevance_count} highly relevant documents containing information about {query}."
         else:
             return f"Found {len(results)} potentially relevant documents."
     
-    def _create_trend_summary(self, trends: Dict) -> str:
-        """Create summary of trend analysis"""
-        if not trends:
+    def _create_trend_summary(self, metric_names: np.ndarray, signs: np.ndarray) -> str:
+        """Create summary of trend analysis from parallel metric name and direction sign arrays"""
+        if metric_names.size == 0:
             return "No trend data available."
         
-        upward_trends = [k for k, v in trends.items() if v.get('direction') == 'upward']
-        downward_trends = [k for k, v in trends.items() if v.get('direction') == 'downward']
+        upward_trends = metric_names[signs > 0].tolist()
+        downward_trends = metric_names[signs < 0].tolist()
         
-        summary_parts = []
+        if upward_trends and downward_trends:
+            return f"Upward trends in: {', '.join(upward_trends)}. Downward trends in: {', '.join(downward_trends)}"
         if upward_trends:
-            summary_parts.append(f"Upward trends in: {', '.join(upward_trends)}")
+            return f"Upward trends in: {', '.join(upward_trends)}"
         if downward_trends:
-            summary_parts.append(f"Downward trends in: {', '.join(downward_trends)}")
-        
-        return '. '.join(summary_parts) if summary_parts else "Mixed trends observed."
+            return f"Downward trends in: {', '.join(downward_trends)}"
+        return "Mixed trends observed."
     
     def _calculate_risk_metrics(self, data: Dict) -> Dict[str, str]:
         """Calculate risk metrics"""
-        risk_metrics = {}
+        if not data:
+            return {}
         
+        metrics, series = [], []
+        add_metric, add_series = metrics.append, series.append
         for metric, values in data.items():
             if len(values) > 1:
-                volatility = self._calculate_volatility(values)
-                if volatility > 0.3:
-                    risk_metrics[f'{metric}_risk'] = 'High'
-                elif volatility > 0.1:
-                    risk_metrics[f'{metric}_risk'] = 'Medium'
-                else:
-                    risk_metrics[f'{metric}_risk'] = 'Low'
-        
-        return risk_metrics
+                add_metric(metric)
+                add_series(calc_kernels.as_float_array(values))
+        if not metrics:
+            return {}
+
+        # Lay every metric's values end to end and reduce all segments at once
+        lengths = np.fromiter(map(len, series), dtype=np.intp, count=len(series))
+        flat = np.concatenate(series)
+        volatilities = calc_kernels.segment_volatility(flat, lengths)
+
+        levels = _RISK_LEVELS[np.digitize(volatilities, _RISK_THRESHOLDS, right=True)]
+        return dict(zip(map(_RISK_KEY_FORMAT, metrics), levels.tolist()))
     
     def _generate_risk_recommendations(self, risk_assessment: Dict) -> List[str]:
         """Generate risk recommendations"""
-        recommendations = []
+        if not risk_assessment:
+            return list(_BASE_RECOMMENDATIONS)
         
         high_risk_areas = [k for k, v in risk_assessment.items() if v == 'High']
         if high_risk_areas:
-            recommendations.append(f"Monitor high-risk areas: {', '.join(high_risk_areas)}")
+            return [f"Monitor high-risk areas: {', '.join(high_risk_areas)}", *_BASE_RECOMMENDATIONS]
         
-        recommendations.append("Diversify portfolio to reduce concentration risk")
-        recommendations.append("Regular monitoring and rebalancing recommended")
-        
-        return recommendations
+        return list(_BASE_RECOMMENDATIONS)
     
-    def _extract_comparison_data(self, accumulated_data: Dict) -> Dict:
-        """Extract data for comparison analysis"""
+    def _extract_comparison_data(self, accumulated_data: Dict) -> Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+        """Extract data for comparison analysis as (float64 values, entity names) array pairs per metric, or None"""
         # Placeholder implementation
-        return {}
+        return None
     
     def _create_comparison_summary(self, comparisons: Dict) -> str:
         """Create summary of comparison analysis"""
         if not comparisons:
             return "No comparison data available."
         
-        summary_parts = []
-        for metric, comp_data in comparisons.items():
-            best = comp_data['best_performer']
-            worst = comp_data['worst_performer']
-            summary_parts.append(f"{metric}: {best} outperforms {worst}")
+        if len(comparisons) == 1:
+            metric, comp_data = next(iter(comparisons.items()))
+            return _COMPARISON_ROW_FORMAT(metric, *_best_and_worst(comp_data))
         
-        return '. '.join(summary_parts)
+        return '. '.join([
+            _COMPARISON_ROW_FORMAT(metric, *_best_and_worst(comp_data))
+            for metric, comp_data in comparisons.items()
+        ])
@@ -4,24 +4,33 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import PyPDF2
+import gc
+import hashlib
+import importlib.util
 import io
 import os
+import re
+import zlib
+from collections import Counter, defaultdict
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 from dotenv import load_dotenv
 from groq import Groq
-import yfinance as yf
 from datetime import datetime, timedelta
+from typing import Optional
+import calc_kernels
 
 # Try to import RAG system, make it optional
 try:
     from rag_system import RAGPipeline, ChatBot
-    from agentic_rag import FinancialAnalysisAgent
+    from agentic_rag import FinancialAnalysisAgent, SemanticCache
     HAS_RAG = True
     RAG_TYPE = "ChromaDB + Agentic RAG"
 except ImportError:
     try:
         from simple_rag import RAGPipeline, ChatBot
-        from agentic_rag import FinancialAnalysisAgent
+        from agentic_rag import FinancialAnalysisAgent, SemanticCache
         HAS_RAG = True
         RAG_TYPE = "Simple + Agentic RAG"
     except ImportError as e:
@@ -33,13 +42,28 @@ except ImportError:
         class ChatBot:
             pass
 
-# Optional imports for additional visualization
+# PDFium is optional; PyPDF2 is the pure-Python fallback for text extraction
 try:
-    import seaborn as sns
-    import matplotlib.pyplot as plt
-    HAS_SEABORN = True
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
 except ImportError:
-    HAS_SEABORN = False
+    HAS_PDFIUM = False
+
+# Zstandard is optional for compressing PDF text kept in the session; zlib is the fallback
+try:
+    import zstandard as zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# Faster optional parsers: PyArrow's multi-threaded CSV reader and the Rust-backed Calamine Excel reader.
+# pandas imports them itself through engine=, so only their availability is checked here.
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+
+# CSV uploads above this size are parsed in chunks when PyArrow is unavailable
+_CSV_CHUNK_THRESHOLD = 100 * 1024 * 1024
+_CSV_CHUNK_ROWS = 500_000
 
 # Load environment variables
 load_dotenv()
@@ -63,242 +87,596 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
-<style>
-    /* Main theme colors */
-    :root {
-        --primary-color: #1f77b4;
-        --secondary-color: #ff7f0e;
-        --success-color: #2ca02c;
-        --warning-color: #ff7f0e;
-        --error-color: #d62728;
-        --background-color: #f8f9fa;
-        --sidebar-bg: #ffffff;
-    }
-    
-    /* Header styling */
-    .main-header {
-        background: linear-gradient(90deg, #1f77b4 0%, #17a2b8 100%);
-        padding: 2rem;
-        border-radius: 10px;
-        margin-bottom: 2rem;
-        color: white;
-        text-align: center;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    
-    .main-header h1 {
-        font-size: 2.5rem;
-        font-weight: 700;
-        margin-bottom: 0.5rem;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-    }
-    
-    .main-header p {
-        font-size: 1.2rem;
-        margin-bottom: 0;
-        opacity: 0.9;
-    }
-    
-    /* Status badges */
-    .status-badge {
-        display: inline-block;
-        padding: 0.5rem 1rem;
-        border-radius: 25px;
-        font-weight: 600;
-        font-size: 0.9rem;
-        margin: 0.25rem;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    
-    .status-success {
-        background-color: #d4edda;
-        color: #155724;
-        border: 1px solid #c3e6cb;
-    }
-    
-    .status-warning {
-        background-color: #fff3cd;
-        color: #856404;
-        border: 1px solid #ffeaa7;
-    }
-    
-    .status-info {
-        background-color: #d1ecf1;
-        color: #0c5460;
-        border: 1px solid #bee5eb;
-    }
-    
-    /* Card styling */
-    .metric-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        border-left: 4px solid var(--primary-color);
-        margin-bottom: 1rem;
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }
-    
-    .metric-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-    }
-    
-    .metric-value {
-        font-size: 2rem;
-        font-weight: 700;
-        color: var(--primary-color);
-        margin-bottom: 0.5rem;
-    }
-    
-    .metric-label {
-        font-size: 0.9rem;
-        color: #6c757d;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
-    
-    /* Sidebar styling */
-    .sidebar-section {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        margin-bottom: 1.5rem;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-        border: 1px solid #e9ecef;
-    }
-    
-    .sidebar-header {
-        font-size: 1.1rem;
-        font-weight: 600;
-        color: #495057;
-        margin-bottom: 1rem;
-        padding-bottom: 0.5rem;
-        border-bottom: 2px solid #e9ecef;
-    }
-    
-    /* Button styling */
-    .stButton > button {
-        border-radius: 8px;
-        border: none;
-        padding: 0.75rem 1.5rem;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-1px);
-        box-shadow: 0 4px 8px rgba(0,0,0,0.15);
-    }
-    
-    /* Chat styling */
-    .chat-container {
-        background: white;
-        border-radius: 10px;
-        padding: 1rem;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        margin-bottom: 1rem;
-    }
-    
-    .chat-message {
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-        animation: fadeIn 0.3s ease-in;
-    }
-    
-    .chat-user {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        margin-left: 20%;
-    }
-    
-    .chat-assistant {
-        background: #f8f9fa;
-        border: 1px solid #e9ecef;
-        margin-right: 20%;
-    }
-    
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    /* File upload area */
-    .upload-area {
-        border: 2px dashed #007bff;
-        border-radius: 10px;
-        padding: 2rem;
-        text-align: center;
-        background: #f8f9ff;
-        margin: 1rem 0;
-        transition: all 0.3s ease;
-    }
-    
-    .upload-area:hover {
-        border-color: #0056b3;
-        background: #e6f3ff;
-    }
-    
-    /* Progress indicators */
-    .progress-container {
-        background: white;
-        padding: 1rem;
-        border-radius: 8px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        margin: 1rem 0;
-    }
-    
-    /* Tabs styling */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-        background-color: #f8f9fa;
-        border-radius: 10px;
-        padding: 0.5rem;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        border-radius: 8px;
-        padding: 0.75rem 1.5rem;
-        font-weight: 600;
-        border: none;
-        transition: all 0.3s ease;
-    }
+@st.cache_data(show_spinner=False)
+def _load_css() -> str:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css"), encoding="utf-8") as f:
+        return f.read()
+
+st.markdown(f"<style>{_load_css()}</style>", unsafe_allow_html=True)
+
+def _optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast numeric columns and store repetitive text columns as categories"""
+    for col in df.select_dtypes('float').columns:
+        df[col] = pd.to_numeric(df[col], downcast='float')
+    for col in df.select_dtypes('integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    if len(df):
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            if df[col].nunique() / len(df) < 0.5:
+                df[col] = df[col].astype('category')
+    return df
+
+# Number of files actually parsed; the cached parsers' bodies only run on a cache miss
+_parse_count = 0
+_PARSE_COUNT_LOCK = threading.Lock()
+
+def _count_parse():
+    global _parse_count
+    with _PARSE_COUNT_LOCK:
+        _parse_count += 1
+
+# Parsers cached on the uploaded bytes so Streamlit reruns skip re-parsing the same file
+@st.cache_data(show_spinner=False)
+def _load_csv(file_bytes: bytes, usecols=None) -> pd.DataFrame:
+    _count_parse()
+    if HAS_PYARROW:
+        df = pd.read_csv(io.BytesIO(file_bytes), engine="pyarrow", usecols=usecols)
+    elif len(file_bytes) > _CSV_CHUNK_THRESHOLD:
+        chunks = pd.read_csv(io.BytesIO(file_bytes), usecols=usecols, chunksize=_CSV_CHUNK_ROWS)
+        df = pd.concat(chunks, ignore_index=True)
+    else:
+        df = pd.read_csv(io.BytesIO(file_bytes), usecols=usecols)
+    return _optimize_dtypes(df)
+
+@st.cache_data(show_spinner=False)
+def _load_excel(file_bytes: bytes, usecols=None) -> pd.DataFrame:
+    _count_parse()
+    if HAS_CALAMINE:
+        df = pd.read_excel(io.BytesIO(file_bytes), engine="calamine", usecols=usecols)
+    else:
+        df = pd.read_excel(io.BytesIO(file_bytes), usecols=usecols)
+    return _optimize_dtypes(df)
+
+def _iter_pdf_pages(file_bytes: bytes):
+    """Yield the text of each PDF page in turn, releasing each page before reading the next"""
+    if HAS_PDFIUM:
+        pdf = pdfium.PdfDocument(file_bytes)
+        try:
+            for i in range(len(pdf)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                try:
+                    yield textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            pdf.close()
+        return
+    
+    import PyPDF2
+    for page in PyPDF2.PdfReader(io.BytesIO(file_bytes)).pages:
+        yield page.extract_text()
+
+@st.cache_data(show_spinner=False)
+def _load_pdf_text(file_bytes: bytes) -> str:
+    _count_parse()
+    return "\n".join(_iter_pdf_pages(file_bytes))
+
+def _pdf_text_stats(text: str):
+    """Return (word count, character count) of PDF text, splitting one line at a time"""
+    return sum(len(line.split()) for line in io.StringIO(text)), len(text)
+
+# Fixed analyst instructions, kept byte-identical and first so the server can reuse the prompt prefix
+_ANALYST_SYSTEM_PROMPT = """You are an expert equity research analyst with deep knowledge of financial markets, valuation methods, and investment strategies. Analyze the data you are given and provide insights.
+
+Please provide a comprehensive analysis including:
+1. Key findings
+2. Investment recommendations
+3. Risk assessment
+4. Market outlook"""
+
+# Column names that mark a date/time axis for the time series chart
+_DATE_COLUMN_RE = re.compile(r'date|time', re.IGNORECASE)
+
+# Frames longer than this are fingerprinted from their first _FINGERPRINT_SAMPLE_ROWS rows only
+_FINGERPRINT_MAX_ROWS = 1_000_000
+_FINGERPRINT_SAMPLE_ROWS = 10_000
+
+def _df_fingerprint(df: pd.DataFrame):
+    """Cheap cache key for a DataFrame: shape, columns, dtypes and a vectorized hash of its rows"""
+    sample = df.head(_FINGERPRINT_SAMPLE_ROWS) if len(df) > _FINGERPRINT_MAX_ROWS else df
+    return (
+        df.shape,
+        tuple(df.columns),
+        tuple(map(str, df.dtypes)),
+        int(pd.util.hash_pandas_object(sample, index=False).sum())
+    )
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _df_fingerprint})
+def _data_overview(df: pd.DataFrame) -> str:
+    """describe() of the numeric columns, computed by the calc_kernels column summary"""
+    numeric = df.select_dtypes(include='number')
+    if numeric.columns.empty:
+        return df.describe().to_string()
+    stats = calc_kernels.column_stats(numeric.to_numpy(dtype=np.float64, na_value=np.nan))
+    return pd.DataFrame(stats, index=calc_kernels.COLUMN_STAT_LABELS, columns=numeric.columns).to_string()
+
+def _correlation_matrix(df: pd.DataFrame, numeric_cols):
+    """Correlation of the numeric columns; np.corrcoef on a float32 view unless pairwise NaN handling is needed"""
+    values = df[numeric_cols].to_numpy(dtype=np.float32)
+    if np.isnan(values).any():
+        return df[numeric_cols].corr()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame(np.corrcoef(values, rowvar=False), index=numeric_cols, columns=numeric_cols)
+
+def _ohlcv_charts(df: pd.DataFrame):
+    """Charts for yfinance price history, whose columns are all numeric and whose dates are the index"""
+    numeric_cols = df.columns.tolist()
+    return [
+        px.imshow(_correlation_matrix(df, numeric_cols),
+                  title="Correlation Matrix",
+                  color_continuous_scale="RdBu_r"),
+        px.histogram(df, x=numeric_cols[0],
+                     title=f"Distribution of {numeric_cols[0]}")
+    ]
+
+# Chart builders for known column sets (sorted), skipping column type inference
+_OHLCV_COLUMNS = ('Close', 'High', 'Low', 'Open', 'Volume')
+_SCHEMA_HANDLERS = {
+    _OHLCV_COLUMNS: _ohlcv_charts,
+    tuple(sorted(_OHLCV_COLUMNS + ('Dividends', 'Stock Splits'))): _ohlcv_charts
+}
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _df_fingerprint})
+def _build_financial_charts(df: pd.DataFrame):
+    handler = _SCHEMA_HANDLERS.get(tuple(sorted(map(str, df.columns))))
+    if handler is not None and all(dtype.kind in 'iuf' for dtype in df.dtypes):
+        return handler(df)
+    
+    charts = []
+    
+    # Detect common financial columns
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    
+    if len(numeric_cols) >= 2:
+        # Time series chart if date column exists
+        date_cols = df.columns[df.columns.astype(str).str.contains(_DATE_COLUMN_RE)]
+        if len(date_cols):
+            fig = px.line(df, x=date_cols[0], y=numeric_cols[0], 
+                         title=f"{numeric_cols[0]} Over Time")
+            charts.append(fig)
+        
+        # Correlation heatmap
+        fig = px.imshow(_correlation_matrix(df, numeric_cols), 
+                       title="Correlation Matrix",
+                       color_continuous_scale="RdBu_r")
+        charts.append(fig)
+        
+        # Distribution plot
+        fig = px.histogram(df, x=numeric_cols[0], 
+                          title=f"Distribution of {numeric_cols[0]}")
+        charts.append(fig)
     
-    .stTabs [aria-selected="true"] {
-        background-color: white;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        color: var(--primary-color);
-    }
+    return charts
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _df_fingerprint})
+def _styled_financial_charts(df: pd.DataFrame):
+    """Upload charts with the data tab's styling applied once, inside the cache"""
+    charts = _build_financial_charts(df)
+    for chart in charts:
+        chart.update_layout(
+            template="plotly_white",
+            font_family="Arial",
+            title_font_size=16,
+            showlegend=True
+        )
+    return charts
+
+def _text_key(content: str) -> str:
+    """Short content digest for preview caching and widget keys, so a chunk keeps its key across queries"""
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest()
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _preview_csv(content_key: str, _content: str, delimiter: str, max_rows: int = 15) -> pd.DataFrame:
+    """
+    First max_rows rows of a CSV-like search result, parsed once per content digest.
+    Only the header and those rows are tokenized, as strings, so dtype and NA inference are skipped.
+    """
+    head = "\n".join(_content.split("\n", max_rows + 1)[:max_rows + 1])
+    return pd.read_csv(io.StringIO(head), delimiter=delimiter, engine='c', dtype=str, na_filter=False, nrows=max_rows)
+
+# Only this much of a result is scanned when deciding whether it is tabular
+_DELIMITER_SCAN_CHARS = 4096
+_DELIMITERS = (',', '\t', '|')
+_DELIMITER_BYTES = np.array([ord(delimiter) for delimiter in _DELIMITERS])
+
+def _detect_delimiter(content: str, min_newlines: int = 1) -> Optional[str]:
+    """
+    Most frequent of ',', tab and '|' in the head of content, or None when the
+    head has fewer than min_newlines line breaks or none of the delimiters.
+    """
+    # Single-line prose is ruled out by a bounded newline count before anything is copied or encoded
+    if content.count('\n', 0, _DELIMITER_SCAN_CHARS) < min_newlines:
+        return None
+    # One byte histogram of the head gives all the delimiter counts together
+    head = np.frombuffer(content[:_DELIMITER_SCAN_CHARS].encode('utf-8', 'ignore'), dtype=np.uint8)
+    counts = np.bincount(head, minlength=256)
+    delimiter_counts = counts[_DELIMITER_BYTES]
+    best = int(np.argmax(delimiter_counts))
+    return _DELIMITERS[best] if delimiter_counts[best] else None
+
+# Price histories longer than this are thinned by a fixed stride before charting
+_MAX_CHART_POINTS = 2000
+
+def _downsample(df: pd.DataFrame) -> pd.DataFrame:
+    """Every n-th row of a long price history, keeping at most _MAX_CHART_POINTS rows"""
+    step = -(-len(df) // _MAX_CHART_POINTS)
+    return df.iloc[::step] if step > 1 else df
+
+# Dashboard price charts are reduced to this many points when the history is longer
+_LTTB_POINTS = 1000
+
+def _lttb_indices(values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Positions kept by Largest-Triangle-Three-Buckets downsampling of an evenly spaced series.
+    Each bucket keeps the point forming the largest triangle with the previous pick and the next bucket's mean, so peaks survive.
+    """
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # The first and last points are always kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    edges = np.append(edges, n)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_x = (hi + edges[i + 2] - 1) / 2.0
+        next_y = values[hi:edges[i + 2]].mean()
+        xs = np.arange(lo, hi)
+        areas = np.abs((prev - next_x) * (values[lo:hi] - values[prev]) - (prev - xs) * (next_y - values[prev]))
+        prev = lo + int(np.argmax(areas))
+        keep[i + 1] = prev
+    return keep
+
+def _bucket_means(values: np.ndarray, n_buckets: int):
+    """Split values into n_buckets contiguous runs and return (run start positions, run means)"""
+    starts = np.linspace(0, len(values), n_buckets, endpoint=False).astype(np.intp)
+    sizes = np.diff(np.append(starts, len(values)))
+    return starts, np.add.reduceat(values, starts) / sizes
+
+# Line charts switch to WebGL traces above this many points
+_WEBGL_MIN_POINTS = 500
+
+def _moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean of every full window, from one cumulative sum (len(values) - window + 1 points)"""
+    totals = np.cumsum(values)
+    totals[window:] = totals[window:] - totals[:-window]
+    return totals[window - 1:] / window
+
+def _dashboard_price_figure(stock_data: pd.DataFrame):
+    """Close price over volume bars for the dashboard's stock analysis"""
+    # Price chart with volume
+    fig = make_subplots(
+        rows=2, cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.1,
+        subplot_titles=('Price Movement', 'Volume'),
+        row_width=[0.7, 0.3]
+    )
     
-    /* Hide default streamlit styling */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Responsive design */
-    @media (max-width: 768px) {
-        .main-header h1 {
-            font-size: 2rem;
-        }
-        
-        .main-header p {
-            font-size: 1rem;
-        }
-        
-        .metric-card {
-            padding: 1rem;
-        }
-        
-        .chat-user, .chat-assistant {
-            margin-left: 0;
-            margin-right: 0;
-        }
-    }
-</style>
-""", unsafe_allow_html=True)
+    dates = stock_data.index
+    close = stock_data['Close'].to_numpy(dtype=np.float64)
+    volume = stock_data['Volume'].to_numpy(dtype=np.float64)
+    close_dates = volume_dates = dates
+    if len(close) > _LTTB_POINTS:
+        # Long histories are reduced before plotting: LTTB keeps the price shape, volume is averaged per bucket
+        kept = _lttb_indices(close, _LTTB_POINTS)
+        close_dates, close = dates[kept], close[kept]
+        starts, volume = _bucket_means(volume, _LTTB_POINTS)
+        volume_dates = dates[starts]
+    
+    # Price line
+    fig.add_trace(go.Scattergl(
+        x=close_dates,
+        y=close,
+        mode='lines',
+        name='Close Price',
+        line=dict(color='#1f77b4', width=2)
+    ), row=1, col=1)
+    
+    # Volume bars
+    fig.add_trace(go.Bar(
+        x=volume_dates,
+        y=volume,
+        name='Volume',
+        marker_color='rgba(31, 119, 180, 0.6)'
+    ), row=2, col=1)
+    
+    fig.update_layout(
+        title="Stock Price & Volume Analysis",
+        height=500,
+        template="plotly_white",
+        showlegend=True
+    )
+    return fig
+
+def _moving_average_figure(stock_data: pd.DataFrame):
+    """Close price with its 20-day and, for long enough histories, 50-day moving averages"""
+    dates = stock_data.index
+    close = stock_data['Close'].to_numpy(dtype=np.float64)
+    # WebGL traces keep long histories responsive
+    scatter = go.Scattergl if len(close) > _WEBGL_MIN_POINTS else go.Scatter
+    
+    fig_ma = go.Figure()
+    fig_ma.add_trace(scatter(
+        x=dates,
+        y=close,
+        mode='lines',
+        name='Close Price',
+        line=dict(color='#1f77b4', width=2)
+    ))
+    fig_ma.add_trace(scatter(
+        x=dates[19:],
+        y=_moving_average(close, 20),
+        mode='lines',
+        name='20-day MA',
+        line=dict(color='#ff7f0e', width=1)
+    ))
+    if len(close) > 50:
+        fig_ma.add_trace(scatter(
+            x=dates[49:],
+            y=_moving_average(close, 50),
+            mode='lines',
+            name='50-day MA',
+            line=dict(color='#2ca02c', width=1)
+        ))
+    
+    fig_ma.update_layout(
+        title="Moving Averages Analysis",
+        height=500,
+        template="plotly_white",
+        showlegend=True
+    )
+    return fig_ma
+    
+def _price_volume_figure(stock_data: pd.DataFrame, symbol: str):
+    """Candlestick over volume bars in a single figure sharing the date axis"""
+    df = _downsample(stock_data)
+    o, h, l, c, v = (df[col].to_numpy() for col in ('Open', 'High', 'Low', 'Close', 'Volume'))
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.03)
+    fig.add_trace(go.Candlestick(x=df.index, open=o, high=h, low=l, close=c, name=symbol), row=1, col=1)
+    fig.add_trace(go.Bar(x=df.index, y=v, name="Volume"), row=2, col=1)
+    fig.update_layout(title=f"{symbol} Stock Price & Trading Volume", xaxis_rangeslider_visible=False, showlegend=False)
+    return fig
+
+# (label, stock info key, formatter) for the stock information metrics
+_STOCK_METRICS = (
+    ("Market Cap", 'marketCap', "${:,}".format),
+    ("P/E Ratio", 'trailingPE', "{:.2f}".format),
+    ("52W High", 'fiftyTwoWeekHigh', "${:.2f}".format),
+    ("52W Low", 'fiftyTwoWeekLow', "${:.2f}".format)
+)
+
+# Cached parser and display label for each supported upload extension
+_FILE_LOADERS = {
+    'csv': (_load_csv, "CSV"),
+    'xlsx': (_load_excel, "Excel"),
+    'xls': (_load_excel, "Excel"),
+    'pdf': (_load_pdf_text, "PDF")
+}
+
+# Document kind for each supported upload extension; also the file type passed to the RAG pipeline
+_RAG_FILE_TYPES = {'csv': 'csv', 'xlsx': 'excel', 'xls': 'excel', 'pdf': 'pdf'}
+
+def _file_extension(filename: str) -> str:
+    return os.path.splitext(filename)[1][1:].lower()
+
+def _content_digest(file_bytes: bytes) -> str:
+    """Short digest identifying an uploaded file's content for RAG ingestion dedupe"""
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+def _ingest_parsed(rag_pipeline, content, filename: str, kind: str):
+    """Add parsed upload content (PDF text or a table) to the RAG pipeline without re-reading the file"""
+    if kind == 'pdf':
+        return rag_pipeline.add_parsed_text(content, filename, kind)
+    return rag_pipeline.add_parsed_dataframe(content, filename, kind)
+
+def _ingest_succeeded(rag_message) -> bool:
+    return bool(rag_message) and rag_message.startswith("Successfully added")
+
+# Parsing releases the GIL in pandas/pyarrow, so uploads are handled by a small worker pool
+_UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+
+# The vector store is not assumed to be thread-safe, so ingestion from workers is serialized
+_RAG_INGEST_LOCK = threading.Lock()
+
+# Quotes are shared across reruns and dashboard buttons for a minute, short enough to stay current intraday
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_stock_data(symbol: str, period: str):
+    import yfinance as yf
+    ticker = yf.Ticker(symbol)
+    return ticker.history(period=period), ticker.info
+
+# Compressed PDF texts kept per session, one per upload
+_MAX_STORED_PDFS = 8
+
+def _store_pdf_text(text, upload_id):
+    """
+    Make an uploaded PDF the session's current one, kept compressed plus an uncompressed preview.
+    Uploads stay in the uploader across reruns, so each is compressed once per file_id and later
+    reruns only switch back to its stored copy.
+    """
+    stored = st.session_state.setdefault('pdf_texts', {})
+    if upload_id not in stored:
+        raw = text.encode('utf-8')
+        compressed = zstd.ZstdCompressor(level=3).compress(raw) if HAS_ZSTD else zlib.compress(raw, 3)
+        stored[upload_id] = (compressed, text[:2000])
+        while len(stored) > _MAX_STORED_PDFS:
+            del stored[next(iter(stored))]
+    st.session_state.pdf_content_compressed, st.session_state.pdf_preview = stored[upload_id]
+
+def _get_pdf_text():
+    """Decompress the session's PDF text on demand"""
+    blob = st.session_state.pdf_content_compressed
+    raw = zstd.ZstdDecompressor().decompress(blob) if HAS_ZSTD else zlib.decompress(blob)
+    return raw.decode('utf-8')
+
+def _close_tail():
+    """Return (latest close, change from the previous close) of the session's stock data, computed once per dataset"""
+    stock_data = st.session_state.stock_data
+    cached = st.session_state.get('stock_close_tail')
+    if cached is None or cached[0] is not stock_data:
+        # Unpack a two-element view of the underlying array rather than indexing the Series twice
+        previous, latest = stock_data['Close'].to_numpy()[-2:]
+        cached = (stock_data, float(latest), float(latest - previous))
+        st.session_state.stock_close_tail = cached
+    return cached[1], cached[2]
+
+def _stock_analysis_figures():
+    """
+    Return (price and volume figure, moving-average figure) for the session's stock data, built once per
+    dataset and reused across reruns. A figure is None when there are too few rows for it.
+    """
+    stock_data = st.session_state.stock_data
+    cached = st.session_state.get('stock_analysis_figures')
+    if cached is None or cached[0] is not stock_data:
+        fig_price = _dashboard_price_figure(stock_data) if len(stock_data) > 0 else None
+        fig_ma = _moving_average_figure(stock_data) if len(stock_data) > 20 else None
+        cached = (stock_data, fig_price, fig_ma)
+        st.session_state.stock_analysis_figures = cached
+    return cached[1], cached[2]
+
+def _analysis_context(stock_symbol):
+    """
+    Return (full context, data-only context) for the AI analysis buttons. Both are rebuilt only when the
+    content of the session's data or PDF preview, the stock data or the symbol change. The upload loop
+    reassigns current_data to a fresh copy on every rerun, so the data is compared by content hash.
+    """
+    current_data = st.session_state.get('current_data')
+    pdf_preview = st.session_state.get('pdf_preview')
+    stock_data = st.session_state.get('stock_data')
+    data_key = None
+    if current_data is not None:
+        data_key = (current_data.shape, tuple(current_data.columns),
+                    int(pd.util.hash_pandas_object(current_data, index=False).sum()))
+    pdf_key = hashlib.blake2b(pdf_preview.encode('utf-8'), digest_size=16).digest() if pdf_preview is not None else None
+    
+    cached = st.session_state.get('analysis_context')
+    if cached is not None and cached[0] == (data_key, pdf_key, stock_symbol) and cached[1] is stock_data:
+        return cached[2]
+    
+    data_context = f"Data overview: {_data_overview(current_data)}" if current_data is not None else ""
+    
+    context = f"{data_context}\n" if data_context else ""
+    if pdf_preview is not None:
+        context += f"PDF content (excerpt): {pdf_preview[:500]}...\n"
+    if stock_data is not None:
+        latest_price, price_change = _close_tail()
+        context += f"Stock: {stock_symbol}, Latest Price: ${latest_price:.2f}, Change: ${price_change:.2f}\n"
+    
+    st.session_state.analysis_context = ((data_key, pdf_key, stock_symbol), stock_data, (context, data_context))
+    return context, data_context
+
+def _table_preview(uploaded_file, data):
+    """Return (first 10 rows, row count, column count) of an uploaded table, computed once per file"""
+    key = f"preview_{uploaded_file.name}_{uploaded_file.size}"
+    if key not in st.session_state:
+        st.session_state[key] = (data.head(10), len(data), len(data.columns))
+    return st.session_state[key]
+
+def _context_digest(context: str) -> str:
+    return hashlib.blake2b(context.encode('utf-8'), digest_size=16).hexdigest()
+
+def _groq_messages(prompt: str, context: str):
+    return [
+        {"role": "system", "content": _ANALYST_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Context:\n{context}\n\nRequest:\n{prompt}"}
+    ]
+
+class _AnswerNotCached(Exception):
+    pass
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _groq_answer(prompt: str, context_key: str, _answer=None) -> str:
+    """
+    Complete GROQ answers memoized on the prompt and a digest of its context. Called without an
+    answer it only looks one up: a miss raises, and exceptions are never cached.
+    """
+    if _answer is None:
+        raise _AnswerNotCached
+    return _answer
+
+# Cosine similarity above which a new query reuses a cached search for the same filters
+_SEARCH_CACHE_THRESHOLD = 0.95
+
+@st.cache_resource(show_spinner=False)
+def _semantic_search_cache(pipeline_id: int):
+    """Near-duplicate query cache for one RAG pipeline, shared across reruns and sessions"""
+    return SemanticCache(threshold=_SEARCH_CACHE_THRESHOLD, max_entries=512)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _search_knowledge_base(_rag_pipeline, pipeline_id: int, query: str, n_results: int,
+                           min_relevance: float = 0.0, file_type=None):
+    """
+    Knowledge base search shared by the search tab and the chat's document search mode.
+    Exact repeats are served by this cache; when the pipeline embeds queries, near-duplicate
+    phrasings with the same filters are served from the semantic cache without a vector query.
+    """
+    embedding_model = getattr(_rag_pipeline, 'embedding_model', None)
+    if embedding_model is None:
+        return _rag_pipeline.search_documents(query, n_results=n_results, min_relevance=min_relevance, file_type=file_type)
+    
+    embedding = np.asarray(embedding_model.encode(query), dtype=np.float32)
+    norm = np.linalg.norm(embedding)
+    if norm > 0:
+        embedding /= norm
+    
+    cache = _semantic_search_cache(pipeline_id)
+    search_key = f"{n_results}|{min_relevance}|{file_type}"
+    cached = cache.lookup(embedding, search_key)
+    if cached is not None:
+        return cached['results']
+    
+    results = _rag_pipeline.search_documents(query, n_results=n_results, query_embedding=embedding,
+                                             min_relevance=min_relevance, file_type=file_type)
+    if not results or 'error' not in results[0]:
+        cache.add(embedding, search_key, {'results': results})
+    return results
+
+def _invalidate_search_caches():
+    """Forget cached searches and stats after the knowledge base changes"""
+    _search_knowledge_base.clear()
+    _semantic_search_cache.clear()
+    _collection_stats.clear()
+    _inventory_sample.clear()
+
+# Rows of the detailed chunk inventory shown per page
+_INVENTORY_PAGE_SIZE = 20
+
+def _source_type(metadata) -> str:
+    """Upper-cased extension of a chunk's source file, or 'Unknown' when it has none"""
+    _, dot, extension = metadata.get('source', '').rpartition('.')
+    return extension.upper() if dot else 'Unknown'
+
+# Search tab content type choices mapped to the file_type stored with each chunk's metadata
+_CONTENT_TYPE_FILTERS = {"All": None, "CSV": 'csv', "PDF": 'pdf', "Excel": 'excel'}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _collection_stats(_rag_pipeline, pipeline_id: int):
+    return _rag_pipeline.get_collection_stats()
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _inventory_sample(_rag_pipeline, pipeline_id: int):
+    """Chunks listed by the document inventory, fetched once so paging and filtering reruns reuse them"""
+    return _rag_pipeline.search_documents("", n_results=50)
+
+def _clear_analysis_caches():
+    """Drop memoized LLM answers and knowledge base searches"""
+    _groq_answer.clear()
+    _invalidate_search_caches()
 
 class EquityResearchBot:
     def __init__(self):
@@ -307,98 +685,122 @@ class EquityResearchBot:
     
     def load_csv_file(self, uploaded_file):
         """Load CSV file and return DataFrame"""
-        try:
-            df = pd.read_csv(uploaded_file)
-            return df, "CSV file loaded successfully!"
-        except Exception as e:
-            return None, f"Error loading CSV: {str(e)}"
+        return self.load_file_bytes(uploaded_file.getvalue(), 'csv')
     
     def load_excel_file(self, uploaded_file):
         """Load Excel file and return DataFrame"""
-        try:
-            df = pd.read_excel(uploaded_file)
-            return df, "Excel file loaded successfully!"
-        except Exception as e:
-            return None, f"Error loading Excel: {str(e)}"
+        return self.load_file_bytes(uploaded_file.getvalue(), 'xlsx')
     
     def load_pdf_file(self, uploaded_file):
         """Extract text from PDF file"""
+        return self.load_file_bytes(uploaded_file.getvalue(), 'pdf')
+    
+    def load_file_bytes(self, file_bytes, file_extension):
+        """Parse raw upload bytes with the loader for their extension"""
+        if file_extension not in _FILE_LOADERS:
+            return None, f"Unsupported file type: {file_extension}"
+        
+        loader, label = _FILE_LOADERS[file_extension]
         try:
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            return text, "PDF file loaded successfully!"
+            return loader(file_bytes), f"{label} file loaded successfully!"
         except Exception as e:
-            return None, f"Error loading PDF: {str(e)}"
-    
-    def analyze_with_groq(self, prompt, context=""):
-        """Send analysis request to GROQ API"""
+            return None, f"Error loading {label}: {str(e)}"
+    
+    def load_files_parallel(self, uploaded_files):
+        """Parse several uploaded files concurrently, returning (content, message) per file in upload order"""
+        return [(result['content'], result['message']) for result in self.process_files_parallel(uploaded_files)]
+    
+    def process_files_parallel(self, uploaded_files, rag_pipeline=None, on_complete=None, ingested_hashes=None):
+        """
+        Parse uploaded files concurrently and, when a RAG pipeline is given, ingest each parsed file
+        from its worker. Returns one dict (content, message, rag_message) per file in upload order;
+        on_complete(done, total, name) is called on the calling thread as each file finishes.
+        Files whose content digest is in ingested_hashes are not ingested again, and newly
+        ingested digests are added to it.
+        """
+        # UploadedFile is not thread-safe, so read the bytes here and hand only bytes to the workers
+        jobs = [(f.name, _file_extension(f.name), f.getvalue()) for f in uploaded_files]
+        if ingested_hashes is None:
+            ingested_hashes = set()
+        digests = [_content_digest(job[2]) for job in jobs] if rag_pipeline is not None else [None] * len(jobs)
+        parses_before = _parse_count
+        
+        def process(job, digest):
+            name, file_extension, file_bytes = job
+            content, message = self.load_file_bytes(file_bytes, file_extension)
+            rag_message = None
+            if content is not None and rag_pipeline is not None:
+                if digest in ingested_hashes:
+                    rag_message = f"{name} is already in the knowledge base"
+                else:
+                    with _RAG_INGEST_LOCK:
+                        rag_message = _ingest_parsed(rag_pipeline, content, name, _RAG_FILE_TYPES[file_extension])
+            return {'content': content, 'message': message, 'rag_message': rag_message}
+        
+        results = [None] * len(jobs)
+        with ThreadPoolExecutor(max_workers=max(1, min(_UPLOAD_WORKERS, len(jobs)))) as executor:
+            futures = {executor.submit(process, job, digest): idx for idx, (job, digest) in enumerate(zip(jobs, digests))}
+            for done, future in enumerate(as_completed(futures), 1):
+                idx = futures[future]
+                results[idx] = future.result()
+                if on_complete:
+                    on_complete(done, len(jobs), jobs[idx][0])
+        
+        added = {digest for digest, result in zip(digests, results) if _ingest_succeeded(result['rag_message'])}
+        if added:
+            ingested_hashes |= added
+            # New documents change search results
+            _invalidate_search_caches()
+        # Parsing and ingesting leave many short-lived page and frame buffers behind; collect them once the
+        # batch is done, but not on reruns served entirely from the parser cache
+        del jobs
+        if added or _parse_count != parses_before:
+            gc.collect()
+        return results
+    
+    def stream_groq(self, prompt, context=""):
+        """Yield a GROQ analysis piece by piece as it is generated, for st.write_stream"""
+        context_key = _context_digest(context)
         try:
-            full_prompt = f"""
-            You are an expert equity research analyst. Analyze the following data and provide insights:
-            
-            Context: {context}
-            
-            Request: {prompt}
-            
-            Please provide a comprehensive analysis including:
-            1. Key findings
-            2. Investment recommendations
-            3. Risk assessment
-            4. Market outlook
-            """
-            
-            completion = client.chat.completions.create(
-                model="llama3-8b-8192",  # Updated to supported model
-                messages=[
-                    {"role": "system", "content": "You are an expert equity research analyst with deep knowledge of financial markets, valuation methods, and investment strategies."},
-                    {"role": "user", "content": full_prompt}
-                ],
+            cached = _groq_answer(prompt, context_key)
+        except _AnswerNotCached:
+            cached = None
+        if cached is not None:
+            yield cached
+            return
+        
+        try:
+            stream = client.chat.completions.create(
+                model="llama3-8b-8192",
+                messages=_groq_messages(prompt, context),
                 temperature=0.1,
-                max_tokens=2000
+                max_tokens=2000,
+                stream=True
             )
-            
-            return completion.choices[0].message.content
+            parts = []
+            for chunk in stream:
+                # Usage and keep-alive frames carry no choices
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content or ""
+                parts.append(text)
+                yield text
         except Exception as e:
-            return f"Error with GROQ analysis: {str(e)}"
+            yield f"Error with GROQ analysis: {str(e)}"
+            return
+        
+        # Only complete answers are memoized
+        _groq_answer(prompt, context_key, "".join(parts))
     
     def create_financial_charts(self, df):
         """Create financial visualization charts"""
-        charts = []
-        
-        # Detect common financial columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        
-        if len(numeric_cols) >= 2:
-            # Time series chart if date column exists
-            date_cols = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
-            if date_cols and len(numeric_cols) > 0:
-                fig = px.line(df, x=date_cols[0], y=numeric_cols[0], 
-                             title=f"{numeric_cols[0]} Over Time")
-                charts.append(fig)
-            
-            # Correlation heatmap
-            if len(numeric_cols) > 1:
-                corr_matrix = df[numeric_cols].corr()
-                fig = px.imshow(corr_matrix, 
-                               title="Correlation Matrix",
-                               color_continuous_scale="RdBu_r")
-                charts.append(fig)
-            
-            # Distribution plot
-            fig = px.histogram(df, x=numeric_cols[0], 
-                              title=f"Distribution of {numeric_cols[0]}")
-            charts.append(fig)
-        
-        return charts
+        return _build_financial_charts(df)
     
     def get_stock_data(self, symbol, period="1y"):
         """Fetch stock data using yfinance"""
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period=period)
-            info = ticker.info
+            # Symbols typed in any case share one cache entry
+            data, info = _fetch_stock_data(symbol.strip().upper(), period)
             return data, info
         except Exception as e:
             return None, f"Error fetching stock data: {str(e)}"
@@ -546,15 +948,19 @@ def data_analysis_tab_basic():
     if uploaded_files:
         st.markdown("### 📋 File Processing Center")
         
+        parsed_files = st.session_state.bot.load_files_parallel(uploaded_files)
+        
         for idx, uploaded_file in enumerate(uploaded_files):
             with st.expander(f"📄 {uploaded_file.name}", expanded=True):
-                file_extension = uploaded_file.name.split('.')[-1].lower()
+                file_extension = _file_extension(uploaded_file.name)
+                kind = _RAG_FILE_TYPES.get(file_extension)
                 
-                if file_extension == 'csv':
-                    data, message = st.session_state.bot.load_csv_file(uploaded_file)
+                if kind == 'csv':
+                    data, message = parsed_files[idx]
                     if data is not None:
                         st.success(f"✅ {message}")
-                        st.dataframe(data.head(10), use_container_width=True)
+                        preview, _, _ = _table_preview(uploaded_file, data)
+                        st.dataframe(preview, use_container_width=True)
                         st.session_state.current_data = data
                         st.session_state.session_stats['files_processed'] += 1
                         
@@ -565,11 +971,12 @@ def data_analysis_tab_basic():
                     else:
                         st.error(f"❌ {message}")
                 
-                elif file_extension in ['xlsx', 'xls']:
-                    data, message = st.session_state.bot.load_excel_file(uploaded_file)
+                elif kind == 'excel':
+                    data, message = parsed_files[idx]
                     if data is not None:
                         st.success(f"✅ {message}")
-                        st.dataframe(data.head(10), use_container_width=True)
+                        preview, _, _ = _table_preview(uploaded_file, data)
+                        st.dataframe(preview, use_container_width=True)
                         st.session_state.current_data = data
                         st.session_state.session_stats['files_processed'] += 1
                         
@@ -580,13 +987,13 @@ def data_analysis_tab_basic():
                     else:
                         st.error(f"❌ {message}")
                 
-                elif file_extension == 'pdf':
-                    text, message = st.session_state.bot.load_pdf_file(uploaded_file)
+                elif kind == 'pdf':
+                    text, message = parsed_files[idx]
                     if text is not None:
                         st.success(f"✅ {message}")
                         preview_text = text[:2000] + "..." if len(text) > 2000 else text
                         st.text_area("Content", preview_text, height=200, key=f"basic_pdf_{idx}")
-                        st.session_state.pdf_content = text
+                        _store_pdf_text(text, uploaded_file.file_id)
                         st.session_state.session_stats['files_processed'] += 1
                     else:
                         st.error(f"❌ {message}")
@@ -707,13 +1114,21 @@ def data_analysis_tab():
         progress_bar = st.progress(0)
         status_text = st.empty()
         
+        status_text.text(f"Processing {len(uploaded_files)} file(s)...")
+        
+        def show_progress(done, total, name):
+            progress_bar.progress(done / total)
+            status_text.text(f"Processed: {name}")
+        
+        parsed_files = st.session_state.bot.process_files_parallel(
+            uploaded_files, st.session_state.rag_pipeline if HAS_RAG else None, show_progress,
+            st.session_state.setdefault('rag_ingested_hashes', set())
+        )
+        
         for idx, uploaded_file in enumerate(uploaded_files):
-            progress = (idx + 1) / len(uploaded_files)
-            progress_bar.progress(progress)
-            status_text.text(f"Processing: {uploaded_file.name}")
-            
             with st.expander(f"📄 {uploaded_file.name}", expanded=True):
-                file_extension = uploaded_file.name.split('.')[-1].lower()
+                file_extension = _file_extension(uploaded_file.name)
+                kind = _RAG_FILE_TYPES.get(file_extension)
                 
                 # File info
                 file_size = len(uploaded_file.getvalue()) / 1024  # KB
@@ -724,107 +1139,73 @@ def data_analysis_tab():
                 </div>
                 """, unsafe_allow_html=True)
                 
-                if file_extension == 'csv':
-                    data, message = st.session_state.bot.load_csv_file(uploaded_file)
+                if kind == 'csv':
+                    data, message = parsed_files[idx]['content'], parsed_files[idx]['message']
                     if data is not None:
                         st.success(f"✅ {message}")
                         
                         # Enhanced data preview
+                        preview, row_count, column_count = _table_preview(uploaded_file, data)
                         col1, col2 = st.columns([2, 1])
                         with col1:
                             st.markdown("**� Data Preview:**")
-                            st.dataframe(data.head(10), use_container_width=True)
+                            st.dataframe(preview, use_container_width=True)
                         
                         with col2:
                             st.markdown("**📈 Quick Stats:**")
-                            st.markdown(f"""
-                            <div class="metric-card">
-                                <div class="metric-value">{len(data):,}</div>
-                                <div class="metric-label">Total Rows</div>
-                            </div>
-                            <div class="metric-card">
-                                <div class="metric-value">{len(data.columns)}</div>
-                                <div class="metric-label">Columns</div>
-                            </div>
-                            """, unsafe_allow_html=True)
+                            st.metric("Total Rows", f"{row_count:,}")
+                            st.metric("Columns", column_count)
                         
                         st.session_state.current_data = data
                         st.session_state.session_stats['files_processed'] += 1
                         
-                        # Add to RAG pipeline if available
+                        # Ingested into the RAG pipeline by the upload worker
                         if HAS_RAG:
-                            uploaded_file.seek(0)
-                            rag_message = st.session_state.rag_pipeline.add_document(
-                                uploaded_file, uploaded_file.name, 'csv'
-                            )
-                            st.info(f"🧠 RAG: {rag_message}")
+                            st.info(f"🧠 RAG: {parsed_files[idx]['rag_message']}")
                         
-                        # Enhanced charts
-                        charts = st.session_state.bot.create_financial_charts(data)
-                        if charts:
-                            st.markdown("**📊 Visualizations:**")
-                            for i, chart in enumerate(charts):
-                                chart.update_layout(
-                                    template="plotly_white",
-                                    font_family="Arial",
-                                    title_font_size=16,
-                                    showlegend=True
-                                )
+                        # Enhanced charts, built only once the user asks for them
+                        if st.toggle("📊 Show visualizations", key=f"show_charts_{idx}"):
+                            for i, chart in enumerate(_styled_financial_charts(data)):
                                 st.plotly_chart(chart, use_container_width=True, key=f"chart_{idx}_{i}")
                     else:
                         st.error(f"❌ {message}")
                 
-                elif file_extension in ['xlsx', 'xls']:
-                    data, message = st.session_state.bot.load_excel_file(uploaded_file)
+                elif kind == 'excel':
+                    data, message = parsed_files[idx]['content'], parsed_files[idx]['message']
                     if data is not None:
                         st.success(f"✅ {message}")
                         
                         # Similar enhanced display for Excel
+                        preview, row_count, column_count = _table_preview(uploaded_file, data)
                         col1, col2 = st.columns([2, 1])
                         with col1:
                             st.markdown("**📊 Data Preview:**")
-                            st.dataframe(data.head(10), use_container_width=True)
+                            st.dataframe(preview, use_container_width=True)
                         
                         with col2:
                             st.markdown("**📈 Quick Stats:**")
-                            st.markdown(f"""
-                            <div class="metric-card">
-                                <div class="metric-value">{len(data):,}</div>
-                                <div class="metric-label">Total Rows</div>
-                            </div>
-                            <div class="metric-card">
-                                <div class="metric-value">{len(data.columns)}</div>
-                                <div class="metric-label">Columns</div>
-                            </div>
-                            """, unsafe_allow_html=True)
+                            st.metric("Total Rows", f"{row_count:,}")
+                            st.metric("Columns", column_count)
                         
                         st.session_state.current_data = data
                         st.session_state.session_stats['files_processed'] += 1
                         
                         if HAS_RAG:
-                            uploaded_file.seek(0)
-                            rag_message = st.session_state.rag_pipeline.add_document(
-                                uploaded_file, uploaded_file.name, 'excel'
-                            )
-                            st.info(f"🧠 RAG: {rag_message}")
+                            st.info(f"🧠 RAG: {parsed_files[idx]['rag_message']}")
                         
-                        charts = st.session_state.bot.create_financial_charts(data)
-                        if charts:
-                            st.markdown("**📊 Visualizations:**")
-                            for i, chart in enumerate(charts):
-                                chart.update_layout(template="plotly_white")
+                        if st.toggle("📊 Show visualizations", key=f"show_excel_charts_{idx}"):
+                            for i, chart in enumerate(_styled_financial_charts(data)):
                                 st.plotly_chart(chart, use_container_width=True, key=f"excel_chart_{idx}_{i}")
                     else:
                         st.error(f"❌ {message}")
                 
-                elif file_extension == 'pdf':
-                    text, message = st.session_state.bot.load_pdf_file(uploaded_file)
+                elif kind == 'pdf':
+                    text, message = parsed_files[idx]['content'], parsed_files[idx]['message']
                     if text is not None:
                         st.success(f"✅ {message}")
                         
                         # Enhanced PDF preview
-                        word_count = len(text.split())
-                        char_count = len(text)
+                        word_count, char_count = _pdf_text_stats(text)
                         
                         col1, col2 = st.columns([3, 1])
                         with col1:
@@ -834,26 +1215,14 @@ def data_analysis_tab():
                         
                         with col2:
                             st.markdown("**📊 Document Stats:**")
-                            st.markdown(f"""
-                            <div class="metric-card">
-                                <div class="metric-value">{word_count:,}</div>
-                                <div class="metric-label">Words</div>
-                            </div>
-                            <div class="metric-card">
-                                <div class="metric-value">{char_count:,}</div>
-                                <div class="metric-label">Characters</div>
-                            </div>
-                            """, unsafe_allow_html=True)
+                            st.metric("Words", f"{word_count:,}")
+                            st.metric("Characters", f"{char_count:,}")
                         
-                        st.session_state.pdf_content = text
+                        _store_pdf_text(text, uploaded_file.file_id)
                         st.session_state.session_stats['files_processed'] += 1
                         
                         if HAS_RAG:
-                            uploaded_file.seek(0)
-                            rag_message = st.session_state.rag_pipeline.add_document(
-                                uploaded_file, uploaded_file.name, 'pdf'
-                            )
-                            st.info(f"🧠 RAG: {rag_message}")
+                            st.info(f"🧠 RAG: {parsed_files[idx]['rag_message']}")
                     else:
                         st.error(f"❌ {message}")
         
@@ -883,26 +1252,8 @@ def data_analysis_tab():
             stock_symbol = getattr(st.session_state, 'current_stock_symbol', 'Stock')
             st.header(f"📈 Stock Data: {stock_symbol}")
             
-            # Stock price chart
-            fig = go.Figure()
-            fig.add_trace(go.Candlestick(
-                x=st.session_state.stock_data.index,
-                open=st.session_state.stock_data['Open'],
-                high=st.session_state.stock_data['High'],
-                low=st.session_state.stock_data['Low'],
-                close=st.session_state.stock_data['Close'],
-                name=stock_symbol
-            ))
-            fig.update_layout(title=f"{stock_symbol} Stock Price", xaxis_rangeslider_visible=False)
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Volume chart
-            fig_volume = px.bar(
-                x=st.session_state.stock_data.index,
-                y=st.session_state.stock_data['Volume'],
-                title=f"{stock_symbol} Trading Volume"
-            )
-            st.plotly_chart(fig_volume, use_container_width=True)
+            # Price and volume share one figure and x axis
+            st.plotly_chart(_price_volume_figure(st.session_state.stock_data, stock_symbol), use_container_width=True)
         
         with col2:
             st.header("🤖 AI Analysis")
@@ -916,114 +1267,89 @@ def data_analysis_tab():
         
         if st.button("🚀 Analyze with AI", type="primary"):
             if analysis_prompt:
-                context = ""
-                
-                # Prepare context from uploaded data
-                if 'current_data' in st.session_state:
-                    context += f"Data overview: {st.session_state.current_data.describe().to_string()}\n"
-                
-                if 'pdf_content' in st.session_state:
-                    context += f"PDF content (excerpt): {st.session_state.pdf_content[:500]}...\n"
-                
-                if 'stock_data' in st.session_state:
-                    latest_price = st.session_state.stock_data['Close'].iloc[-1]
-                    price_change = st.session_state.stock_data['Close'].iloc[-1] - st.session_state.stock_data['Close'].iloc[-2]
-                    context += f"Stock: {stock_symbol}, Latest Price: ${latest_price:.2f}, Change: ${price_change:.2f}\n"
-                
-                with st.spinner("Analyzing with AI..."):
-                    analysis = st.session_state.bot.analyze_with_groq(analysis_prompt, context)
-                    st.markdown("### 📊 Analysis Results")
-                    st.markdown(analysis)
+                context, _ = _analysis_context(stock_symbol)
+                st.markdown("### 📊 Analysis Results")
+                st.write_stream(st.session_state.bot.stream_groq(analysis_prompt, context))
         
         # Quick analysis buttons
         st.header("⚡ Quick Analysis")
         
         if st.button("📈 Market Trends"):
-            with st.spinner("Analyzing market trends..."):
-                analysis = st.session_state.bot.analyze_with_groq(
-                    "Analyze current market trends and provide investment insights",
-                    "Focus on equity markets and growth opportunities"
-                )
-                st.markdown(analysis)
+            st.write_stream(st.session_state.bot.stream_groq(
+                "Analyze current market trends and provide investment insights",
+                "Focus on equity markets and growth opportunities"
+            ))
         
         if st.button("⚠️ Risk Assessment"):
-            context = ""
-            if 'current_data' in st.session_state:
-                context = f"Data overview: {st.session_state.current_data.describe().to_string()}"
-            
-            with st.spinner("Assessing risks..."):
-                analysis = st.session_state.bot.analyze_with_groq(
-                    "Provide a comprehensive risk assessment for the given data",
-                    context
-                )
-                st.markdown(analysis)
+            _, context = _analysis_context(stock_symbol)
+            st.write_stream(st.session_state.bot.stream_groq(
+                "Provide a comprehensive risk assessment for the given data",
+                context
+            ))
         
         if 'stock_info' in st.session_state:
             st.header("📋 Stock Information")
             info = st.session_state.stock_info
             
-            # Display key metrics
-            metrics_col1, metrics_col2 = st.columns(2)
-            
-            with metrics_col1:
-                st.metric("Market Cap", f"${info.get('marketCap', 'N/A'):,}" if info.get('marketCap') else "N/A")
-                st.metric("P/E Ratio", f"{info.get('trailingPE', 'N/A'):.2f}" if info.get('trailingPE') else "N/A")
-            
-            with metrics_col2:
-                st.metric("52W High", f"${info.get('fiftyTwoWeekHigh', 'N/A'):.2f}" if info.get('fiftyTwoWeekHigh') else "N/A")
-                st.metric("52W Low", f"${info.get('fiftyTwoWeekLow', 'N/A'):.2f}" if info.get('fiftyTwoWeekLow') else "N/A")
+            # Display key metrics, two per column
+            metrics_cols = st.columns(2)
+            for i, (label, key, fmt) in enumerate(_STOCK_METRICS):
+                value = info.get(key)
+                with metrics_cols[i // 2]:
+                    st.metric(label, fmt(value) if value else "N/A")
 
-def chatbot_tab():
-    """Enhanced chatbot interface with agentic RAG capabilities"""
-    st.markdown("## 🤖 AI Financial Assistant")
-    
-    # Display system capabilities
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        st.markdown("### 💬 Chat Interface")
-        st.markdown("Ask sophisticated financial questions and get precise, data-driven answers!")
-        
-        # Display RAG database stats
-        stats = st.session_state.rag_pipeline.get_collection_stats()
-        if 'error' not in stats:
-            st.info(f"📚 Knowledge Base: {stats['total_documents']} document chunks loaded")
-    
-    with col2:
-        st.markdown("### 🧠 Agentic Capabilities")
-        agentic_available = hasattr(st.session_state, 'agentic_rag') and st.session_state.agentic_rag is not None
-        
-        if agentic_available:
-            st.success("✅ Agentic RAG: Active")
-            st.markdown("""
-            **Advanced Features:**
-            - 🎯 Multi-step analysis planning
-            - 🧮 Automatic calculations
-            - 📈 Trend analysis
-            - ⚠️ Risk assessment
-            - 🔍 Entity comparison
-            - 📊 Data synthesis
-            """)
-        else:
-            st.warning("⚠️ Agentic RAG: Limited")
-            st.markdown("Basic RAG functionality available")
-    
-    # Analysis mode selection
-    st.markdown("### ⚙️ Analysis Mode")
-    analysis_mode = st.radio(
-        "Choose your analysis approach:",
-        ["🤖 Agentic Analysis (Recommended)", "💬 Standard Chat", "🔍 Document Search"],
-        help="Agentic Analysis provides multi-step reasoning and calculations"
+# (label, question, widget key) for the chat's quick analysis buttons
+_QUICK_ANALYSIS_QUESTIONS = (
+    ("📊 Comprehensive Analysis", "Provide a comprehensive financial analysis of all uploaded data including key metrics, trends, and investment insights", "quick_comprehensive"),
+    ("⚠️ Risk Assessment", "Conduct a detailed risk assessment of the financial data and provide risk mitigation recommendations", "quick_risk"),
+    ("📈 Performance Analysis", "Analyze performance trends and calculate key financial ratios and growth metrics", "quick_performance")
+)
+
+# Starter questions shown on an empty chat, each with a fixed widget key
+_EXAMPLE_QUESTIONS = tuple((question, f"example_{i}") for i, question in enumerate([
+    "Analyze the financial performance trends in my uploaded data",
+    "What are the key risk factors for the companies in my portfolio?",
+    "Calculate the growth rate and profitability metrics",
+    "Compare the performance of different stocks or time periods",
+    "Provide investment recommendations based on the data"
+]))
+
+def _render_plan(plan) -> str:
+    """Markdown for an agentic answer's analysis steps"""
+    return "**Analysis Steps:**\n\n" + "\n\n".join(
+        f"**Step {step['step']}**: {step['description']} ({step['tool']})" for step in plan
     )
-    
+
+def _render_sources(sources) -> str:
+    """Markdown list of the sources behind an agentic answer"""
+    return "**Sources Used:**\n\n" + "\n".join(f"- 📄 {source}" for source in sources)
+
+# Number of chat messages rendered per window; "Load older messages" widens it by this much
+_CHAT_WINDOW = 50
+
+def _widen_chat_window():
+    st.session_state.chat_window = st.session_state.get('chat_window', _CHAT_WINDOW) + _CHAT_WINDOW
+
+def _queue_question(question):
+    """Button callback that hands a canned question to the chat fragment"""
+    st.session_state.pending_question = question
+
+@st.fragment
+def _chat_fragment(analysis_mode):
+    """Chat history, input and response generation; reruns on its own when the user sends a message"""
     # Chat interface
     if "chat_messages" not in st.session_state:
         st.session_state.chat_messages = []
     
-    # Display chat history
+    # Display chat history, newest _CHAT_WINDOW messages first and older ones on request
+    messages = st.session_state.chat_messages
+    start = max(0, len(messages) - st.session_state.get('chat_window', _CHAT_WINDOW))
+    if start:
+        st.button(f"⬆️ Load older messages ({start} hidden)", key="load_older_messages", on_click=_widen_chat_window)
+    
     chat_container = st.container()
     with chat_container:
-        for message in st.session_state.chat_messages:
+        for message in islice(messages, start, None):
             with st.chat_message(message["role"]):
                 if message["role"] == "assistant" and "metadata" in message:
                     # Enhanced display for agentic responses
@@ -1034,23 +1360,22 @@ def chatbot_tab():
                     # Show analysis details in expander
                     if "plan" in metadata and metadata["plan"]:
                         with st.expander("🔍 Analysis Plan & Details"):
-                            st.markdown("**Analysis Steps:**")
-                            for step in metadata["plan"]:
-                                st.markdown(f"**Step {step['step']}**: {step['description']} ({step['tool']})")
+                            st.markdown(metadata.get("rendered_plan") or _render_plan(metadata["plan"]))
                             
                             if "confidence" in metadata:
                                 confidence = metadata["confidence"]
                                 st.metric("Confidence Score", f"{confidence:.2%}")
                             
                             if "sources" in metadata and metadata["sources"]:
-                                st.markdown("**Sources Used:**")
-                                for source in metadata["sources"]:
-                                    st.markdown(f"- 📄 {source}")
+                                st.markdown(metadata.get("rendered_sources") or _render_sources(metadata["sources"]))
                 else:
                     st.markdown(message["content"])
     
     # Chat input
     user_question = st.chat_input("Ask me anything about your financial data...")
+    if not user_question:
+        # Quick analysis and example buttons queue their question through a callback
+        user_question = st.session_state.pop('pending_question', None)
     
     if user_question:
         # Add user message to chat history
@@ -1069,8 +1394,8 @@ def chatbot_tab():
             context_data['stock_data'] = st.session_state.stock_data
             context_data['stock_info'] = getattr(st.session_state, 'stock_info', {})
         
-        if hasattr(st.session_state, 'pdf_content'):
-            context_data['pdf_content'] = st.session_state.pdf_content
+        if hasattr(st.session_state, 'pdf_content_compressed'):
+            context_data['pdf_content'] = _get_pdf_text()
         
         # Generate response based on selected mode
         with st.chat_message("assistant"):
@@ -1078,7 +1403,11 @@ def chatbot_tab():
                 try:
                     if analysis_mode == "🤖 Agentic Analysis (Recommended)" and st.session_state.get('agentic_rag'):
                         # Use Agentic RAG
-                        result = st.session_state.agentic_rag.process_query(user_question, context_data)
+                        # Show the summary as it is generated; the last result is the complete answer
+                        answer_box = st.empty()
+                        for result in st.session_state.agentic_rag.process_query_stream(user_question, context_data):
+                            if result.get('partial'):
+                                answer_box.markdown(result['answer'])
                         
                         if result['success']:
                             response = result['answer']
@@ -1090,8 +1419,11 @@ def chatbot_tab():
                                 'sources': result.get('sources', []),
                                 'intermediate_results': result.get('intermediate_results', {})
                             }
+                            # Rendered once here so the history does not rebuild them on every rerun
+                            metadata['rendered_plan'] = _render_plan(metadata['plan'])
+                            metadata['rendered_sources'] = _render_sources(metadata['sources'])
                             
-                            st.markdown(response)
+                            answer_box.markdown(response)
                             
                             # Display confidence and sources
                             if metadata['confidence'] > 0:
@@ -1110,7 +1442,7 @@ def chatbot_tab():
                             
                         else:
                             error_response = result['answer']
-                            st.error(error_response)
+                            answer_box.error(error_response)
                             st.session_state.chat_messages.append({
                                 "role": "assistant", 
                                 "content": error_response
@@ -1118,7 +1450,8 @@ def chatbot_tab():
                     
                     elif analysis_mode == "🔍 Document Search":
                         # Use document search only
-                        search_results = st.session_state.rag_pipeline.search_documents(user_question, n_results=5)
+                        rag_pipeline = st.session_state.rag_pipeline
+                        search_results = _search_knowledge_base(rag_pipeline, id(rag_pipeline), user_question, 5)
                         
                         if search_results and 'error' not in search_results[0]:
                             response = f"Found {len(search_results)} relevant results:\n\n"
@@ -1144,28 +1477,58 @@ def chatbot_tab():
                     error_response = f"I encountered an error while processing your question: {str(e)}"
                     st.error(error_response)
                     st.session_state.chat_messages.append({"role": "assistant", "content": error_response})
+
+def chatbot_tab():
+    """Enhanced chatbot interface with agentic RAG capabilities"""
+    st.markdown("## 🤖 AI Financial Assistant")
     
-    # Quick question buttons
-    st.markdown("### ⚡ Quick Analysis Options")
-    col1, col2, col3 = st.columns(3)
+    # Display system capabilities
+    col1, col2 = st.columns([2, 1])
     
     with col1:
-        if st.button("📊 Comprehensive Analysis"):
-            question = "Provide a comprehensive financial analysis of all uploaded data including key metrics, trends, and investment insights"
-            st.session_state.chat_messages.append({"role": "user", "content": question})
-            st.rerun()
+        st.markdown("### 💬 Chat Interface")
+        st.markdown("Ask sophisticated financial questions and get precise, data-driven answers!")
+        
+        # Display RAG database stats
+        rag_pipeline = st.session_state.rag_pipeline
+        stats = _collection_stats(rag_pipeline, id(rag_pipeline))
+        if 'error' not in stats:
+            st.info(f"📚 Knowledge Base: {stats['total_documents']} document chunks loaded")
     
     with col2:
-        if st.button("⚠️ Risk Assessment"):
-            question = "Conduct a detailed risk assessment of the financial data and provide risk mitigation recommendations"
-            st.session_state.chat_messages.append({"role": "user", "content": question})
-            st.rerun()
+        st.markdown("### 🧠 Agentic Capabilities")
+        agentic_available = hasattr(st.session_state, 'agentic_rag') and st.session_state.agentic_rag is not None
+        
+        if agentic_available:
+            st.success("✅ Agentic RAG: Active")
+            st.markdown("""
+            **Advanced Features:**
+            - 🎯 Multi-step analysis planning
+            - 🧮 Automatic calculations
+            - 📈 Trend analysis
+            - ⚠️ Risk assessment
+            - 🔍 Entity comparison
+            - 📊 Data synthesis
+            """)
+        else:
+            st.warning("⚠️ Agentic RAG: Limited")
+            st.markdown("Basic RAG functionality available")
     
-    with col3:
-        if st.button("📈 Performance Analysis"):
-            question = "Analyze performance trends and calculate key financial ratios and growth metrics"
-            st.session_state.chat_messages.append({"role": "user", "content": question})
-            st.rerun()
+    # Analysis mode selection
+    st.markdown("### ⚙️ Analysis Mode")
+    analysis_mode = st.radio(
+        "Choose your analysis approach:",
+        ["🤖 Agentic Analysis (Recommended)", "💬 Standard Chat", "🔍 Document Search"],
+        help="Agentic Analysis provides multi-step reasoning and calculations"
+    )
+    
+    _chat_fragment(analysis_mode)
+    
+    # Quick question buttons
+    st.markdown("### ⚡ Quick Analysis Options")
+    for col, (label, question, key) in zip(st.columns(len(_QUICK_ANALYSIS_QUESTIONS)), _QUICK_ANALYSIS_QUESTIONS):
+        with col:
+            st.button(label, key=key, on_click=_queue_question, args=(question,))
     
     # Chat management
     st.markdown("---")
@@ -1174,6 +1537,7 @@ def chatbot_tab():
     with col1:
         if st.button("🧹 Clear Chat History"):
             st.session_state.chat_messages = []
+            st.session_state.pop('chat_window', None)
             if hasattr(st.session_state, 'chatbot'):
                 st.session_state.chatbot.clear_conversation()
             st.rerun()
@@ -1181,10 +1545,12 @@ def chatbot_tab():
     with col2:
         if st.button("💾 Export Chat"):
             if st.session_state.chat_messages:
-                chat_export = "\n".join([f"{msg['role'].title()}: {msg['content']}" for msg in st.session_state.chat_messages])
+                # str.join would build a list of every line first; write the lines straight into one buffer instead
+                chat_export = io.StringIO()
+                chat_export.writelines(f"{msg['role'].title()}: {msg['content']}\n" for msg in st.session_state.chat_messages)
                 st.download_button(
                     "📥 Download Chat",
-                    chat_export,
+                    chat_export.getvalue().encode('utf-8'),
                     file_name=f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
                     mime="text/plain"
                 )
@@ -1192,9 +1558,10 @@ def chatbot_tab():
     with col3:
         if st.button("📊 Chat Analytics"):
             if st.session_state.chat_messages:
-                total_messages = len(st.session_state.chat_messages)
-                user_messages = len([m for m in st.session_state.chat_messages if m['role'] == 'user'])
-                assistant_messages = len([m for m in st.session_state.chat_messages if m['role'] == 'assistant'])
+                role_counts = Counter(m['role'] for m in st.session_state.chat_messages)
+                total_messages = sum(role_counts.values())
+                user_messages = role_counts['user']
+                assistant_messages = role_counts['assistant']
                 
                 st.info(f"📈 Chat Stats: {total_messages} total messages ({user_messages} questions, {assistant_messages} responses)")
     
@@ -1202,18 +1569,11 @@ def chatbot_tab():
     if not st.session_state.chat_messages:
         st.markdown("### 💡 Example Questions to Get Started")
         
-        example_questions = [
-            "Analyze the financial performance trends in my uploaded data",
-            "What are the key risk factors for the companies in my portfolio?",
-            "Calculate the growth rate and profitability metrics",
-            "Compare the performance of different stocks or time periods",
-            "Provide investment recommendations based on the data"
-        ]
-        
-        for question in example_questions:
-            if st.button(f"💬 {question}", key=f"example_{hash(question)}"):
-                st.session_state.chat_messages.append({"role": "user", "content": question})
-                st.rerun()
+        for question, key in _EXAMPLE_QUESTIONS:
+            st.button(f"💬 {question}", key=key, on_click=_queue_question, args=(question,))
+
+def _toggle_inventory():
+    st.session_state.inventory_open = not st.session_state.get('inventory_open', False)
 
 def rag_management_tab():
     """RAG pipeline management interface"""
@@ -1238,15 +1598,25 @@ def rag_management_tab():
     )
     
     if uploaded_files_rag:
+        ingested_hashes = st.session_state.setdefault('rag_ingested_hashes', set())
         for uploaded_file in uploaded_files_rag:
-            file_extension = uploaded_file.name.split('.')[-1].lower()
+            # Reruns keep the files in the widget; skip anything this session already embedded
+            digest = _content_digest(uploaded_file.getvalue())
+            if digest in ingested_hashes:
+                continue
             
             with st.spinner(f"Processing {uploaded_file.name}..."):
-                message = st.session_state.rag_pipeline.add_document(
-                    uploaded_file, uploaded_file.name, 
-                    'excel' if file_extension in ['xlsx', 'xls'] else file_extension
-                )
+                # Parse through the same cached loaders as the analysis tab, then ingest the parsed content
+                file_extension = _file_extension(uploaded_file.name)
+                content, message = st.session_state.bot.load_file_bytes(uploaded_file.getvalue(), file_extension)
+                if content is None:
+                    st.error(message)
+                    continue
+                message = _ingest_parsed(st.session_state.rag_pipeline, content, uploaded_file.name, _RAG_FILE_TYPES[file_extension])
                 st.success(message)
+            if _ingest_succeeded(message):
+                ingested_hashes.add(digest)
+                _invalidate_search_caches()
     
     # Search functionality
     st.subheader("🔍 Search Knowledge Base")
@@ -1273,110 +1643,104 @@ def rag_management_tab():
     
     if search_query:
         with st.spinner("🔍 Searching knowledge base..."):
-            results = st.session_state.rag_pipeline.search_documents(search_query, n_results=num_results)
+            rag_pipeline = st.session_state.rag_pipeline
+            results = _search_knowledge_base(rag_pipeline, id(rag_pipeline), search_query, num_results)
             
-            if results and 'error' not in results[0]:
-                # Filter by relevance score and content type
-                filtered_results = [
-                    r for r in results 
-                    if r['relevance_score'] >= min_relevance and 
-                    (content_type == "All" or content_type.lower() in r['metadata'].get('source', '').lower())
-                ]
+            if not results or 'error' not in results[0]:
+                # Filter the cached results with array masks, so moving a filter widget never searches again
+                # Metadata is read into arrays once; the filters and every view below index them instead of re-parsing
+                file_type = _CONTENT_TYPE_FILTERS[content_type]
+                scores = np.fromiter((r['relevance_score'] for r in results), dtype=np.float64, count=len(results))
+                file_types = np.array([r['metadata'].get('file_type') for r in results], dtype=object)
+                source_types = np.array([_source_type(r['metadata']) for r in results], dtype=object)
+                mask = scores >= min_relevance
+                if file_type:
+                    mask &= file_types == file_type
+                kept = np.flatnonzero(mask)
+                filtered_results = [results[i] for i in kept]
+                filtered_types = source_types[kept]
                 
                 if filtered_results:
                     st.success(f"📊 Found {len(filtered_results)} relevant results (filtered from {len(results)} total)")
                     
                     if search_mode == "📊 Table View":
-                        # Create a structured table view
-                        import pandas as pd
+                        # Build the table column by column; the full content stays in filtered_results for the detail viewer
+                        contents = pd.Series([r['content'] for r in filtered_results], dtype=object)
+                        display_df = pd.DataFrame({
+                            "Rank": np.arange(1, len(filtered_results) + 1),
+                            "Relevance": scores[kept].astype(np.float32),
+                            "Source": [r['metadata'].get('filename', 'Unknown') for r in filtered_results],
+                            "Type": filtered_types,
+                            "Content Preview": contents.str.slice(0, 200) + np.where(contents.str.len() > 200, "...", "")
+                        })
                         
-                        # Prepare data for table
-                        table_data = []
-                        for i, result in enumerate(filtered_results):
-                            # Truncate content for table view
-                            content_preview = result['content'][:200] + "..." if len(result['content']) > 200 else result['content']
-                            
-                            table_data.append({
-                                "Rank": i + 1,
-                                "Relevance": f"{result['relevance_score']:.3f}",
-                                "Source": result['metadata'].get('filename', 'Unknown'),
-                                "Type": result['metadata'].get('source', 'Unknown').split('.')[-1].upper() if '.' in result['metadata'].get('source', '') else 'Unknown',
-                                "Content Preview": content_preview,
-                                "Full Content": result['content']  # Hidden column for details
-                            })
-                        
-                        # Display as interactive table
-                        df = pd.DataFrame(table_data)
-                        display_df = df[["Rank", "Relevance", "Source", "Type", "Content Preview"]]
-                        
-                        # Style the dataframe
+                        # Style the dataframe; selecting a row opens it in the detail viewer below
                         st.markdown("### 📋 Search Results Table")
-                        st.dataframe(
+                        table_event = st.dataframe(
                             display_df,
                             use_container_width=True,
                             height=400,
+                            on_select="rerun",
+                            selection_mode="single-row",
+                            key="search_results_table",
                             column_config={
                                 "Rank": st.column_config.NumberColumn("🏆 Rank", width="small"),
-                                "Relevance": st.column_config.TextColumn("📊 Score", width="small"),
+                                "Relevance": st.column_config.NumberColumn("📊 Score", width="small", format="%.3f"),
                                 "Source": st.column_config.TextColumn("📁 Source", width="medium"),
                                 "Type": st.column_config.TextColumn("📄 Type", width="small"),
                                 "Content Preview": st.column_config.TextColumn("📝 Preview", width="large")
                             }
                         )
                         
-                        # Detailed view for selected results
+                        # Detailed view for the selected result, the top result until a row is picked
                         st.markdown("### 🔍 Detailed Content Viewer")
-                        selected_result = st.selectbox(
-                            "Select a result to view full content:",
-                            options=range(len(filtered_results)),
-                            format_func=lambda x: f"Result {x+1}: {filtered_results[x]['metadata'].get('filename', 'Unknown')} (Score: {filtered_results[x]['relevance_score']:.3f})"
-                        )
+                        selected_rows = [row for row in table_event.selection.rows if row < len(filtered_results)]
+                        if selected_rows:
+                            selected_result = selected_rows[0]
+                        else:
+                            # Nothing selected yet: fall back to the top result
+                            selected_result = 0
+                            st.caption("Select a row in the table to view its full content.")
+                        
+                        result = filtered_results[selected_result]
                         
-                        if selected_result is not None:
-                            result = filtered_results[selected_result]
+                        # Display detailed result in a nice format
+                        with st.container():
+                            st.markdown(f"""
+                            <div style="background: #f8f9fa; padding: 1.5rem; border-radius: 10px; border-left: 4px solid #007bff; margin: 1rem 0;">
+                                <h4 style="color: #007bff; margin-bottom: 0.5rem;">📄 {result['metadata'].get('filename', 'Unknown')}</h4>
+                                <p style="margin: 0.25rem 0;"><strong>Relevance Score:</strong> {result['relevance_score']:.3f}</p>
+                                <p style="margin: 0.25rem 0;"><strong>Content Type:</strong> {filtered_types[selected_result]}</p>
+                            </div>
+                            """, unsafe_allow_html=True)
                             
-                            # Display detailed result in a nice format
-                            with st.container():
-                                st.markdown(f"""
-                                <div style="background: #f8f9fa; padding: 1.5rem; border-radius: 10px; border-left: 4px solid #007bff; margin: 1rem 0;">
-                                    <h4 style="color: #007bff; margin-bottom: 0.5rem;">📄 {result['metadata'].get('filename', 'Unknown')}</h4>
-                                    <p style="margin: 0.25rem 0;"><strong>Relevance Score:</strong> {result['relevance_score']:.3f}</p>
-                                    <p style="margin: 0.25rem 0;"><strong>Content Type:</strong> {result['metadata'].get('source', 'Unknown').split('.')[-1].upper() if '.' in result['metadata'].get('source', '') else 'Unknown'}</p>
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Try to parse structured data if it's CSV-like
-                                content = result['content']
-                                if any(delimiter in content for delimiter in [',', '\t', '|']) and '\n' in content:
-                                    st.markdown("**📊 Structured Data Preview:**")
-                                    try:
-                                        # Try to parse as CSV-like data
-                                        lines = content.split('\n')
-                                        if len(lines) > 1:
-                                            # Detect delimiter
-                                            delimiter = ',' if ',' in lines[0] else '\t' if '\t' in lines[0] else '|' if '|' in lines[0] else ','
-                                            
-                                            # Create a mini DataFrame
-                                            import io
-                                            try:
-                                                df_preview = pd.read_csv(io.StringIO(content), delimiter=delimiter, nrows=10)
-                                                st.dataframe(df_preview, use_container_width=True)
-                                                st.caption(f"Showing first {min(len(df_preview), 10)} rows of structured data")
-                                            except:
-                                                # Fallback to text display
-                                                st.text_area("Full Content", content, height=300, key=f"content_detail_{selected_result}")
-                                        else:
-                                            st.text_area("Full Content", content, height=300, key=f"content_detail_{selected_result}")
-                                    except:
-                                        st.text_area("Full Content", content, height=300, key=f"content_detail_{selected_result}")
-                                else:
-                                    st.markdown("**📝 Full Content:**")
-                                    st.text_area("", content, height=300, key=f"content_detail_{selected_result}", label_visibility="collapsed")
+                            # Try to parse structured data if it's CSV-like
+                            content = result['content']
+                            content_key = _text_key(content)
+                            delimiter = _detect_delimiter(content)
+                            if delimiter:
+                                st.markdown("**📊 Structured Data Preview:**")
+                                # Create a mini DataFrame
+                                try:
+                                    df_preview = _preview_csv(content_key, content, delimiter, 10)
+                                    st.dataframe(df_preview, use_container_width=True)
+                                    st.caption(f"Showing first {min(len(df_preview), 10)} rows of structured data")
+                                except:
+                                    # Fallback to text display
+                                    st.text_area("Full Content", content, height=300, key=f"content_detail_{content_key}")
+                            else:
+                                st.markdown("**📝 Full Content:**")
+                                st.text_area("", content, height=300, key=f"content_detail_{content_key}", label_visibility="collapsed")
                     
                     else:  # Detailed View mode
                         st.markdown("### 📄 Detailed Search Results")
                         
+                        seen_keys = set()
                         for i, result in enumerate(filtered_results):
+                            # Widgets are keyed by content, with the rank added only when a chunk repeats in the results
+                            content_key = _text_key(result['content'])
+                            widget_key = content_key if content_key not in seen_keys else f"{content_key}_{i}"
+                            seen_keys.add(content_key)
                             with st.expander(
                                 f"📋 Result {i+1} - {result['metadata'].get('filename', 'Unknown')} "
                                 f"(Relevance: {result['relevance_score']:.3f})", 
@@ -1389,8 +1753,7 @@ def rag_management_tab():
                                 with meta_col2:
                                     st.metric("Source File", result['metadata'].get('filename', 'Unknown'))
                                 with meta_col3:
-                                    file_type = result['metadata'].get('source', 'Unknown').split('.')[-1].upper() if '.' in result['metadata'].get('source', '') else 'Unknown'
-                                    st.metric("File Type", file_type)
+                                    st.metric("File Type", filtered_types[i])
                                 
                                 st.markdown("---")
                                 
@@ -1398,41 +1761,37 @@ def rag_management_tab():
                                 content = result['content']
                                 
                                 # Check if content looks like structured data
-                                if any(delimiter in content for delimiter in [',', '\t', '|']) and '\n' in content and len(content.split('\n')) > 2:
+                                delimiter = _detect_delimiter(content, min_newlines=2)
+                                if delimiter:
                                     st.markdown("**📊 Structured Data:**")
                                     try:
-                                        lines = content.split('\n')
-                                        delimiter = ',' if ',' in lines[0] else '\t' if '\t' in lines[0] else '|' if '|' in lines[0] else ','
-                                        
-                                        import io
-                                        df_preview = pd.read_csv(io.StringIO(content), delimiter=delimiter, nrows=15)
+                                        df_preview = _preview_csv(content_key, content, delimiter)
                                         st.dataframe(df_preview, use_container_width=True)
                                         
                                         if len(df_preview) >= 15:
                                             st.caption("Showing first 15 rows. Full content available below.")
                                         
                                         # Option to show raw content
-                                        if st.checkbox(f"Show raw content for result {i+1}", key=f"raw_{i}"):
-                                            st.text_area("Raw Content", content, height=200, key=f"raw_content_{i}")
+                                        if st.checkbox(f"Show raw content for result {i+1}", key=f"raw_{widget_key}"):
+                                            st.text_area("Raw Content", content, height=200, key=f"raw_content_{widget_key}")
                                     
                                     except Exception as e:
                                         st.markdown("**📝 Content:**")
-                                        st.text_area("", content, height=200, key=f"content_{i}", label_visibility="collapsed")
+                                        st.text_area("", content, height=200, key=f"content_{widget_key}", label_visibility="collapsed")
                                         st.caption(f"Could not parse as structured data: {str(e)}")
                                 else:
                                     st.markdown("**📝 Content:**")
-                                    st.text_area("", content, height=200, key=f"content_{i}", label_visibility="collapsed")
+                                    st.text_area("", content, height=200, key=f"content_{widget_key}", label_visibility="collapsed")
                 
                 else:
                     st.warning(f"⚠️ No results found matching your criteria (relevance ≥ {min_relevance}, type: {content_type})")
-                    if len(results) > 0:
+                    if results:
                         st.info(f"💡 Try lowering the relevance threshold or changing the content type filter. Found {len(results)} results before filtering.")
+                    else:
+                        st.info("🔍 No results found for your query. Try different keywords or check if documents are properly loaded.")
             
             else:
-                if results and 'error' in results[0]:
-                    st.error(f"❌ Search error: {results[0]['error']}")
-                else:
-                    st.info("🔍 No results found for your query. Try different keywords or check if documents are properly loaded.")
+                st.error(f"❌ Search error: {results[0]['error']}")
     
     # Database management
     st.subheader("🛠️ Database Management")
@@ -1444,49 +1803,50 @@ def rag_management_tab():
             st.success(f"📊 Knowledge Base contains {stats['total_documents']} document chunks")
             
             # Try to get a sample of documents to show what's in the database
-            if st.button("📋 Show Document Inventory", key="show_inventory"):
+            inventory_label = "📋 Hide Document Inventory" if st.session_state.get('inventory_open') else "📋 Show Document Inventory"
+            st.button(inventory_label, key="show_inventory", on_click=_toggle_inventory)
+            
+            if st.session_state.get('inventory_open'):
                 try:
                     # Get all documents with a broad search
-                    sample_results = st.session_state.rag_pipeline.search_documents("", n_results=50)
+                    sample_results = _inventory_sample(st.session_state.rag_pipeline, id(st.session_state.rag_pipeline))
                     
                     if sample_results and 'error' not in sample_results[0]:
                         # Create inventory table
                         inventory_data = []
-                        file_stats = {}
+                        file_stats = defaultdict(lambda: {'chunks': 0, 'total_chars': 0, 'type': 'Unknown'})
                         
                         for i, result in enumerate(sample_results):
-                            filename = result['metadata'].get('filename', 'Unknown')
-                            source = result['metadata'].get('source', 'Unknown')
+                            metadata = result['metadata']
+                            filename = metadata.get('filename', 'Unknown')
+                            file_type = _source_type(metadata)
                             content_length = len(result['content'])
                             
                             # Count chunks per file
-                            if filename not in file_stats:
-                                file_stats[filename] = {'chunks': 0, 'total_chars': 0, 'type': source.split('.')[-1].upper() if '.' in source else 'Unknown'}
-                            
-                            file_stats[filename]['chunks'] += 1
-                            file_stats[filename]['total_chars'] += content_length
+                            stats_info = file_stats[filename]
+                            stats_info['chunks'] += 1
+                            stats_info['total_chars'] += content_length
+                            stats_info['type'] = file_type
                             
                             inventory_data.append({
                                 "Chunk ID": i + 1,
                                 "Filename": filename,
-                                "File Type": source.split('.')[-1].upper() if '.' in source else 'Unknown',
-                                "Content Length": content_length,
-                                "Content Preview": result['content'][:100] + "..." if len(result['content']) > 100 else result['content']
+                                "File Type": file_type,
+                                "Content Length": content_length
                             })
                         
                         # File summary table
                         st.markdown("#### 📁 File Summary")
-                        summary_data = []
-                        for filename, stats_info in file_stats.items():
-                            summary_data.append({
-                                "Filename": filename,
-                                "Type": stats_info['type'],
-                                "Chunks": stats_info['chunks'],
-                                "Total Characters": f"{stats_info['total_chars']:,}",
-                                "Avg Chunk Size": f"{stats_info['total_chars'] // stats_info['chunks']:,}"
-                            })
-                        
-                        summary_df = pd.DataFrame(summary_data)
+                        # Sizes stay integer columns; the table formats them on the client
+                        chunk_counts = np.fromiter((info['chunks'] for info in file_stats.values()), dtype=np.int64, count=len(file_stats))
+                        total_chars = np.fromiter((info['total_chars'] for info in file_stats.values()), dtype=np.int64, count=len(file_stats))
+                        summary_df = pd.DataFrame({
+                            "Filename": list(file_stats),
+                            "Type": [info['type'] for info in file_stats.values()],
+                            "Chunks": chunk_counts,
+                            "Total Characters": total_chars,
+                            "Avg Chunk Size": total_chars // chunk_counts
+                        })
                         st.dataframe(
                             summary_df,
                             use_container_width=True,
@@ -1494,8 +1854,8 @@ def rag_management_tab():
                                 "Filename": st.column_config.TextColumn("📁 File", width="large"),
                                 "Type": st.column_config.TextColumn("📄 Type", width="small"),
                                 "Chunks": st.column_config.NumberColumn("🧩 Chunks", width="small"),
-                                "Total Characters": st.column_config.TextColumn("📊 Size", width="medium"),
-                                "Avg Chunk Size": st.column_config.TextColumn("📏 Avg/Chunk", width="medium")
+                                "Total Characters": st.column_config.NumberColumn("📊 Size", width="medium", format="%d"),
+                                "Avg Chunk Size": st.column_config.NumberColumn("📏 Avg/Chunk", width="medium", format="%d")
                             }
                         )
                         
@@ -1505,9 +1865,11 @@ def rag_management_tab():
                         # Filter options
                         col1, col2 = st.columns(2)
                         with col1:
+                            # Sorted so the options keep their order whatever order the chunks come back in
                             selected_file = st.selectbox(
                                 "Filter by file:",
-                                ["All Files"] + list(file_stats.keys())
+                                ("All Files",) + tuple(sorted(file_stats)),
+                                key="inventory_file_filter"
                             )
                         with col2:
                             show_content = st.checkbox("Show full content preview", value=False)
@@ -1518,7 +1880,17 @@ def rag_management_tab():
                             filtered_inventory = [item for item in inventory_data if item["Filename"] == selected_file]
                         
                         if filtered_inventory:
-                            inventory_df = pd.DataFrame(filtered_inventory)
+                            # Only the visible page is turned into a DataFrame and sent to the browser
+                            n_pages = -(-len(filtered_inventory) // _INVENTORY_PAGE_SIZE)
+                            page = 1
+                            if n_pages > 1:
+                                page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, key=f"inventory_page_{selected_file}")
+                            view = filtered_inventory[(page - 1) * _INVENTORY_PAGE_SIZE:page * _INVENTORY_PAGE_SIZE]
+                            
+                            inventory_df = pd.DataFrame(view)
+                            if not show_content:
+                                previews = [sample_results[item["Chunk ID"] - 1]['content'] for item in view]
+                                inventory_df["Content Preview"] = [text[:100] + "..." if len(text) > 100 else text for text in previews]
                             
                             if not show_content:
                                 # Show summary view
@@ -1539,6 +1911,8 @@ def rag_management_tab():
                                     "Content Preview": st.column_config.TextColumn("📝 Preview", width="large")
                                 }
                             )
+                            if n_pages > 1:
+                                st.caption(f"Page {page} of {n_pages} ({len(filtered_inventory)} chunks)")
                             
                             if show_content:
                                 st.markdown("#### 📝 Full Content Viewer")
@@ -1561,21 +1935,21 @@ def rag_management_tab():
                                     
                                     # Check if it's structured data
                                     content = full_result['content']
-                                    if any(delimiter in content for delimiter in [',', '\t', '|']) and '\n' in content:
+                                    content_key = _text_key(content)
+                                    delimiter = _detect_delimiter(content)
+                                    if delimiter:
                                         try:
-                                            lines = content.split('\n')
-                                            delimiter = ',' if ',' in lines[0] else '\t' if '\t' in lines[0] else '|' if '|' in lines[0] else ','
-                                            
-                                            import io
-                                            df_chunk = pd.read_csv(io.StringIO(content), delimiter=delimiter)
+                                            df_chunk = _preview_csv(content_key, content, delimiter)
                                             st.markdown("**📊 Structured Data:**")
                                             st.dataframe(df_chunk, use_container_width=True)
+                                            if len(df_chunk) >= 15:
+                                                st.caption("Showing first 15 rows of this chunk")
                                         except:
                                             st.markdown("**📝 Raw Content:**")
-                                            st.text_area("", content, height=300, key=f"chunk_content_{selected_chunk}", label_visibility="collapsed")
+                                            st.text_area("", content, height=300, key=f"chunk_content_{content_key}", label_visibility="collapsed")
                                     else:
                                         st.markdown("**📝 Content:**")
-                                        st.text_area("", content, height=300, key=f"chunk_content_{selected_chunk}", label_visibility="collapsed")
+                                        st.text_area("", content, height=300, key=f"chunk_content_{content_key}", label_visibility="collapsed")
                         else:
                             st.info("No chunks found for the selected file.")
                     
@@ -1588,12 +1962,14 @@ def rag_management_tab():
             st.error(f"Database error: {stats.get('error', 'Unknown error')}")
     
     # Management actions
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         if st.button("🗑️ Clear Knowledge Base", type="secondary"):
             if st.session_state.get('confirm_clear', False):
                 message = st.session_state.rag_pipeline.clear_database()
+                _invalidate_search_caches()
+                st.session_state.rag_ingested_hashes = set()
                 st.success(message)
                 st.session_state.confirm_clear = False
                 st.rerun()
@@ -1604,6 +1980,100 @@ def rag_management_tab():
     with col2:
         if st.button("📊 Refresh Stats"):
             st.rerun()
+    
+    with col3:
+        if st.button("♻️ Clear Cache"):
+            _clear_analysis_caches()
+            st.success("Cached analyses and searches cleared")
+
+def _set_current_stock(symbol, stock_data, stock_info):
+    """Make a loaded symbol the session's current stock"""
+    st.session_state.stock_data = stock_data
+    st.session_state.stock_info = stock_info
+    st.session_state.current_stock_symbol = symbol  # Store the symbol
+    st.session_state.session_stats['queries_made'] += 1
+
+@st.fragment
+def _watchlist_panel(symbol):
+    """One watchlist entry; its widgets rerun only this panel until new data is loaded"""
+    with st.expander(f"🔍 {symbol} - Click for details", expanded=False):
+        if st.button(f"📈 Load {symbol} Data", key=f"load_{symbol}"):
+            with st.spinner(f"Fetching {symbol} data..."):
+                stock_data, stock_info = st.session_state.bot.get_stock_data(symbol)
+            if stock_data is not None:
+                _set_current_stock(symbol, stock_data, stock_info)
+                # The analysis section and the other tabs read the new data, so the whole app reruns once
+                st.rerun()
+            st.error(f"❌ Failed to load {symbol} data")
+        
+        if st.session_state.get('current_stock_symbol') == symbol and st.session_state.get('stock_data') is not None:
+            stock_data = st.session_state.stock_data
+            stock_info = st.session_state.get('stock_info')
+            st.success(f"✅ {symbol} data loaded successfully!")
+            
+            # Quick stock info
+            if stock_info:
+                st.markdown(f"""
+                **Company:** {stock_info.get('longName', 'N/A')}  
+                **Sector:** {stock_info.get('sector', 'N/A')}  
+                **Market Cap:** ${stock_info.get('marketCap', 0):,.0f}
+                """)
+            
+            # Mini chart
+            if len(stock_data) > 0:
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(
+                    x=stock_data.index,
+                    y=stock_data['Close'],
+                    mode='lines',
+                    name=f'{symbol} Close Price',
+                    line=dict(color='#1f77b4', width=2)
+                ))
+                fig.update_layout(
+                    title=f"{symbol} Price Trend (Last 30 Days)",
+                    height=300,
+                    template="plotly_white",
+                    showlegend=False,
+                    margin=dict(l=20, r=20, t=40, b=20)
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def _custom_lookup_fragment():
+    """Custom symbol lookup; typing and failed lookups rerun only this block"""
+    # Custom stock lookup
+    st.markdown("**📊 Custom Stock Lookup**")
+    custom_symbol = st.text_input(
+        "Enter Stock Symbol",
+        placeholder="e.g., AAPL, GOOGL, TSLA",
+        key="custom_stock_input"
+    )
+    
+    if st.button("🔍 Analyze Stock", key="analyze_custom"):
+        if custom_symbol:
+            symbol = custom_symbol.upper()
+            with st.spinner(f"Analyzing {symbol}..."):
+                stock_data, stock_info = st.session_state.bot.get_stock_data(symbol)
+            if stock_data is not None:
+                _set_current_stock(symbol, stock_data, stock_info)
+                st.rerun()
+            st.error(f"❌ Could not find data for {symbol}")
+        else:
+            st.warning("⚠️ Please enter a stock symbol")
+
+@st.fragment
+def _quick_actions_fragment():
+    """Dashboard quick actions, rerun on their own"""
+    # Quick actions
+    st.markdown("### ⚡ Quick Actions")
+    if st.button("🔄 Refresh Dashboard", key="refresh_dashboard"):
+        st.rerun()
+    
+    if st.button("📊 Export Analysis", key="export_analysis"):
+        st.info("📁 Export functionality coming soon!")
+    
+    if st.button("📈 Generate Report", key="generate_report"):
+        st.info("📄 Report generation coming soon!")
 
 def market_dashboard_tab():
     """Enhanced market dashboard with real-time data and insights"""
@@ -1613,40 +2083,16 @@ def market_dashboard_tab():
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">📊</div>
-            <div class="metric-label">Market Status</div>
-            <div class="metric-sublabel">Live Trading</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.metric("📊 Market Status", "Live Trading")
     
     with col2:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">🔥</div>
-            <div class="metric-label">Trending</div>
-            <div class="metric-sublabel">Top Movers</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.metric("🔥 Trending", "Top Movers")
     
     with col3:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">💹</div>
-            <div class="metric-label">Volatility</div>
-            <div class="metric-sublabel">Medium</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.metric("💹 Volatility", "Medium")
     
     with col4:
-        st.markdown("""
-        <div class="metric-card">
-            <div class="metric-value">📈</div>
-            <div class="metric-label">Sentiment</div>
-            <div class="metric-sublabel">Bullish</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.metric("📈 Sentiment", "Bullish")
     
     st.markdown("---")
     
@@ -1662,73 +2108,12 @@ def market_dashboard_tab():
         watchlist_container = st.container()
         
         with watchlist_container:
-            for i, symbol in enumerate(popular_stocks):
-                with st.expander(f"🔍 {symbol} - Click for details", expanded=False):
-                    if st.button(f"📈 Load {symbol} Data", key=f"load_{symbol}"):
-                        with st.spinner(f"Fetching {symbol} data..."):
-                            stock_data, stock_info = st.session_state.bot.get_stock_data(symbol)
-                            if stock_data is not None:
-                                st.session_state.stock_data = stock_data
-                                st.session_state.stock_info = stock_info
-                                st.session_state.current_stock_symbol = symbol  # Store the symbol
-                                st.success(f"✅ {symbol} data loaded successfully!")
-                                st.session_state.session_stats['queries_made'] += 1
-                                
-                                # Quick stock info
-                                if stock_info:
-                                    st.markdown(f"""
-                                    **Company:** {stock_info.get('longName', 'N/A')}  
-                                    **Sector:** {stock_info.get('sector', 'N/A')}  
-                                    **Market Cap:** ${stock_info.get('marketCap', 0):,.0f}
-                                    """)
-                                
-                                # Mini chart
-                                if len(stock_data) > 0:
-                                    import plotly.graph_objects as go
-                                    fig = go.Figure()
-                                    fig.add_trace(go.Scatter(
-                                        x=stock_data.index,
-                                        y=stock_data['Close'],
-                                        mode='lines',
-                                        name=f'{symbol} Close Price',
-                                        line=dict(color='#1f77b4', width=2)
-                                    ))
-                                    fig.update_layout(
-                                        title=f"{symbol} Price Trend (Last 30 Days)",
-                                        height=300,
-                                        template="plotly_white",
-                                        showlegend=False,
-                                        margin=dict(l=20, r=20, t=40, b=20)
-                                    )
-                                    st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.error(f"❌ Failed to load {symbol} data")
+            for symbol in popular_stocks:
+                _watchlist_panel(symbol)
     
     with col2:
         st.markdown("### 🔧 Market Tools")
-        
-        # Custom stock lookup
-        st.markdown("**📊 Custom Stock Lookup**")
-        custom_symbol = st.text_input(
-            "Enter Stock Symbol",
-            placeholder="e.g., AAPL, GOOGL, TSLA",
-            key="custom_stock_input"
-        )
-        
-        if st.button("🔍 Analyze Stock", key="analyze_custom"):
-            if custom_symbol:
-                with st.spinner(f"Analyzing {custom_symbol.upper()}..."):
-                    stock_data, stock_info = st.session_state.bot.get_stock_data(custom_symbol.upper())
-                    if stock_data is not None:
-                        st.session_state.stock_data = stock_data
-                        st.session_state.stock_info = stock_info
-                        st.session_state.current_stock_symbol = custom_symbol.upper()  # Store the symbol
-                        st.success(f"✅ Analysis complete for {custom_symbol.upper()}!")
-                        st.session_state.session_stats['queries_made'] += 1
-                    else:
-                        st.error(f"❌ Could not find data for {custom_symbol.upper()}")
-            else:
-                st.warning("⚠️ Please enter a stock symbol")
+        _custom_lookup_fragment()
         
         st.markdown("---")
         
@@ -1742,23 +2127,13 @@ def market_dashboard_tab():
         </div>
         """, unsafe_allow_html=True)
         
-        # Quick actions
-        st.markdown("### ⚡ Quick Actions")
-        if st.button("🔄 Refresh Dashboard", key="refresh_dashboard"):
-            st.rerun()
-        
-        if st.button("📊 Export Analysis", key="export_analysis"):
-            st.info("📁 Export functionality coming soon!")
-        
-        if st.button("📈 Generate Report", key="generate_report"):
-            st.info("📄 Report generation coming soon!")
+        _quick_actions_fragment()
     
     # Current stock data display
     if hasattr(st.session_state, 'stock_data') and st.session_state.stock_data is not None:
         st.markdown("---")
         st.markdown("### 📊 Current Stock Analysis")
         
-        stock_data = st.session_state.stock_data
         stock_info = getattr(st.session_state, 'stock_info', {})
         
         # Stock info cards
@@ -1767,120 +2142,31 @@ def market_dashboard_tab():
             
             with info_col1:
                 current_price = stock_info.get('regularMarketPrice', 0)
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">${current_price:.2f}</div>
-                    <div class="metric-label">Current Price</div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.metric("Current Price", f"${current_price:.2f}")
             
             with info_col2:
                 market_cap = stock_info.get('marketCap', 0)
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">${market_cap/1e9:.1f}B</div>
-                    <div class="metric-label">Market Cap</div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.metric("Market Cap", f"${market_cap/1e9:.1f}B")
             
             with info_col3:
                 pe_ratio = stock_info.get('trailingPE', 0)
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">{pe_ratio:.2f}</div>
-                    <div class="metric-label">P/E Ratio</div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.metric("P/E Ratio", f"{pe_ratio:.2f}")
             
             with info_col4:
                 volume = stock_info.get('regularMarketVolume', 0)
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">{volume/1e6:.1f}M</div>
-                    <div class="metric-label">Volume</div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.metric("Volume", f"{volume/1e6:.1f}M")
         
         # Enhanced stock charts
+        fig_price, fig_ma = _stock_analysis_figures()
         chart_col1, chart_col2 = st.columns(2)
         
         with chart_col1:
-            if len(stock_data) > 0:
-                import plotly.graph_objects as go
-                from plotly.subplots import make_subplots
-                
-                # Price chart with volume
-                fig = make_subplots(
-                    rows=2, cols=1,
-                    shared_xaxes=True,
-                    vertical_spacing=0.1,
-                    subplot_titles=('Price Movement', 'Volume'),
-                    row_width=[0.7, 0.3]
-                )
-                
-                # Price line
-                fig.add_trace(go.Scatter(
-                    x=stock_data.index,
-                    y=stock_data['Close'],
-                    mode='lines',
-                    name='Close Price',
-                    line=dict(color='#1f77b4', width=2)
-                ), row=1, col=1)
-                
-                # Volume bars
-                fig.add_trace(go.Bar(
-                    x=stock_data.index,
-                    y=stock_data['Volume'],
-                    name='Volume',
-                    marker_color='rgba(31, 119, 180, 0.6)'
-                ), row=2, col=1)
-                
-                fig.update_layout(
-                    title="Stock Price & Volume Analysis",
-                    height=500,
-                    template="plotly_white",
-                    showlegend=True
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
+            if fig_price is not None:
+                st.plotly_chart(fig_price, use_container_width=True)
         
         with chart_col2:
             # Moving averages chart
-            if len(stock_data) > 20:
-                stock_data['MA20'] = stock_data['Close'].rolling(window=20).mean()
-                stock_data['MA50'] = stock_data['Close'].rolling(window=50).mean()
-                
-                fig_ma = go.Figure()
-                fig_ma.add_trace(go.Scatter(
-                    x=stock_data.index,
-                    y=stock_data['Close'],
-                    mode='lines',
-                    name='Close Price',
-                    line=dict(color='#1f77b4', width=2)
-                ))
-                fig_ma.add_trace(go.Scatter(
-                    x=stock_data.index,
-                    y=stock_data['MA20'],
-                    mode='lines',
-                    name='20-day MA',
-                    line=dict(color='#ff7f0e', width=1)
-                ))
-                if len(stock_data) > 50:
-                    fig_ma.add_trace(go.Scatter(
-                        x=stock_data.index,
-                        y=stock_data['MA50'],
-                        mode='lines',
-                        name='50-day MA',
-                        line=dict(color='#2ca02c', width=1)
-                    ))
-                
-                fig_ma.update_layout(
-                    title="Moving Averages Analysis",
-                    height=500,
-                    template="plotly_white",
-                    showlegend=True
-                )
-                
+            if fig_ma is not None:
                 st.plotly_chart(fig_ma, use_container_width=True)
 
 if __name__ == "__main__":
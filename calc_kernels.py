@@ -0,0 +1,228 @@
+"""
+Numeric kernels for the financial analysis agent.
+Kernels are compiled with Numba when it is installed and fall back to plain
+NumPy otherwise, so callers never need to check which path is active.
+"""
+
+import numpy as np
+
+# Numba is optional; without it the decorator is a no-op
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+def as_float_array(values) -> np.ndarray:
+    """Convert a list of values to a contiguous float64 array for the kernels"""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+@njit(cache=True)
+def summary_stats(arr):
+    """Return (mean, median, std) of a series"""
+    return arr.mean(), np.median(arr), arr.std()
+
+@njit(cache=True)
+def growth_rate(arr):
+    """Percentage change from the first to the last value"""
+    if arr[0] == 0:
+        return 0.0
+    return (arr[-1] - arr[0]) / arr[0] * 100.0
+
+@njit(cache=True, fastmath=True)
+def _volatility_loop(arr):
+    # Welford's single pass keeps the variance stable for large, close values
+    mean = 0.0
+    m2 = 0.0
+    count = 0
+    for x in arr:
+        count += 1
+        delta = x - mean
+        mean += delta / count
+        m2 += delta * (x - mean)
+    if count == 0 or mean == 0:
+        return 0.0
+    return np.sqrt(m2 / count) / mean
+
+# Bit flags describing which character classes appear in a piece of content
+CONTENT_HAS_DELIMITER = 1  # ',', '\t' or '|'
+CONTENT_HAS_NEWLINE = 2
+CONTENT_HAS_DIGIT = 4
+
+@njit(cache=True)
+def _scan_flags_loop(buf):
+    flags = 0
+    for byte in buf:
+        if byte == 44 or byte == 9 or byte == 124:
+            flags |= CONTENT_HAS_DELIMITER
+        elif byte == 10:
+            flags |= CONTENT_HAS_NEWLINE
+        elif 48 <= byte <= 57:
+            flags |= CONTENT_HAS_DIGIT
+        if flags == 7:
+            break
+    return flags
+
+def _scan_flags_numpy(buf):
+    counts = np.bincount(buf, minlength=256)
+    flags = 0
+    if counts[44] or counts[9] or counts[124]:
+        flags |= CONTENT_HAS_DELIMITER
+    if counts[10]:
+        flags |= CONTENT_HAS_NEWLINE
+    if counts[48:58].any():
+        flags |= CONTENT_HAS_DIGIT
+    return flags
+
+# A compiled byte loop beats bincount; without Numba the loop would run in Python
+_scan_flags = _scan_flags_loop if HAS_NUMBA else _scan_flags_numpy
+
+def content_flags(content: str) -> int:
+    """Scan content once and return its CONTENT_HAS_* bit flags"""
+    return int(_scan_flags(np.frombuffer(content.encode('utf-8', 'ignore'), dtype=np.uint8)))
+
+@njit(cache=True, parallel=True)
+def _segment_volatility_loop(flat, starts, lengths):
+    # Segments are independent, so prange spreads them across cores without the GIL
+    out = np.empty(lengths.shape[0])
+    for i in prange(lengths.shape[0]):
+        out[i] = _volatility_loop(flat[starts[i]:starts[i] + lengths[i]])
+    return out
+
+def segment_volatility(flat: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Coefficient of variation of each consecutive segment of flat, segment i holding lengths[i] values"""
+    starts = np.zeros(len(lengths), dtype=np.intp)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    if HAS_NUMBA:
+        return _segment_volatility_loop(flat, starts, lengths)
+    means = np.add.reduceat(flat, starts) / lengths
+    centered = flat - np.repeat(means, lengths)
+    stds = np.sqrt(np.add.reduceat(centered * centered, starts) / lengths)
+    return np.divide(stds, means, out=np.zeros_like(stds), where=means != 0)
+
+# Pattern codes returned by series_trends
+PATTERN_VOLATILE = 0
+PATTERN_GROWTH = 1
+PATTERN_DECLINE = 2
+PATTERN_INSUFFICIENT = 3
+
+@njit(cache=True)
+def _series_trends_loop(flat, lengths):
+    n = lengths.shape[0]
+    signs = np.zeros(n, dtype=np.int8)
+    volatilities = np.zeros(n)
+    recent_changes = np.zeros(n)
+    patterns = np.zeros(n, dtype=np.int8)
+    start = 0
+    for i in range(n):
+        seg = flat[start:start + lengths[i]]
+        start += lengths[i]
+        if seg[-1] > seg[0]:
+            signs[i] = 1
+        elif seg[-1] < seg[0]:
+            signs[i] = -1
+        volatilities[i] = _volatility_loop(seg)
+        if seg[-2] != 0:
+            recent_changes[i] = (seg[-1] - seg[-2]) / seg[-2] * 100.0
+        if seg.shape[0] < 3:
+            patterns[i] = PATTERN_INSUFFICIENT
+            continue
+        rising = True
+        falling = True
+        for j in range(1, seg.shape[0]):
+            if seg[j] < seg[j - 1]:
+                rising = False
+            elif seg[j] > seg[j - 1]:
+                falling = False
+        if rising:
+            patterns[i] = PATTERN_GROWTH
+        elif falling:
+            patterns[i] = PATTERN_DECLINE
+    return signs, volatilities, recent_changes, patterns
+
+def _series_trends_numpy(flat, lengths):
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    first, last, prev = flat[starts], flat[ends - 1], flat[ends - 2]
+    signs = np.sign(last - first).astype(np.int8)
+    volatilities = segment_volatility(flat, lengths)
+    recent_changes = np.divide((last - prev) * 100.0, prev, out=np.zeros_like(prev), where=prev != 0)
+
+    # Differences spanning two segments are zeroed so reduceat only counts each segment's own steps
+    diffs = np.diff(flat)
+    diffs[ends[:-1] - 1] = 0
+    rises = np.add.reduceat((diffs > 0).astype(np.intp), starts)
+    falls = np.add.reduceat((diffs < 0).astype(np.intp), starts)
+    patterns = np.where(falls == 0, PATTERN_GROWTH, np.where(rises == 0, PATTERN_DECLINE, PATTERN_VOLATILE)).astype(np.int8)
+    patterns[lengths < 3] = PATTERN_INSUFFICIENT
+    return signs, volatilities, recent_changes, patterns
+
+def series_trends(flat: np.ndarray, lengths: np.ndarray):
+    """
+    Trend metrics for every series laid end to end in flat (each at least two values long).
+    Returns (direction signs, volatilities, recent changes, PATTERN_* codes), one entry per series.
+    """
+    if HAS_NUMBA:
+        return _series_trends_loop(flat, lengths)
+    return _series_trends_numpy(flat, lengths)
+
+# Row labels of column_stats output, matching DataFrame.describe() for numeric columns
+COLUMN_STAT_LABELS = ('count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max')
+
+@njit(cache=True)
+def _sorted_quantile(col, q):
+    # Linear interpolation between the closest ranks, as pandas does
+    pos = q * (col.shape[0] - 1)
+    lo = int(np.floor(pos))
+    hi = min(lo + 1, col.shape[0] - 1)
+    return col[lo] + (col[hi] - col[lo]) * (pos - lo)
+
+@njit(cache=True, parallel=True)
+def _column_stats_loop(values):
+    out = np.full((8, values.shape[1]), np.nan)
+    for j in prange(values.shape[1]):
+        col = values[:, j]
+        col = np.sort(col[~np.isnan(col)])
+        n = col.shape[0]
+        out[0, j] = n
+        if n == 0:
+            continue
+        mean = col.mean()
+        out[1, j] = mean
+        if n > 1:
+            out[2, j] = np.sqrt(((col - mean) ** 2).sum() / (n - 1))
+        out[3, j] = col[0]
+        out[4, j] = _sorted_quantile(col, 0.25)
+        out[5, j] = _sorted_quantile(col, 0.5)
+        out[6, j] = _sorted_quantile(col, 0.75)
+        out[7, j] = col[n - 1]
+    return out
+
+def _column_stats_numpy(values):
+    out = np.full((8, values.shape[1]), np.nan)
+    out[0] = (~np.isnan(values)).sum(axis=0)
+    present = out[0] > 0
+    if present.any():
+        cols = values[:, present]
+        out[1, present] = np.nanmean(cols, axis=0)
+        out[2, present & (out[0] > 1)] = np.nanstd(values[:, present & (out[0] > 1)], axis=0, ddof=1)
+        out[3, present] = np.nanmin(cols, axis=0)
+        out[4:7, present] = np.nanpercentile(cols, [25, 50, 75], axis=0)
+        out[7, present] = np.nanmax(cols, axis=0)
+    return out
+
+def column_stats(values: np.ndarray) -> np.ndarray:
+    """
+    Summary statistics of each column of a 2-D float array, ignoring NaNs.
+    Returns an array of shape (8, n_columns) whose rows follow COLUMN_STAT_LABELS.
+    """
+    if HAS_NUMBA:
+        # Column-major storage keeps each column's values contiguous for the per-column loop
+        return _column_stats_loop(np.asfortranarray(values, dtype=np.float64))
+    return _column_stats_numpy(np.asarray(values, dtype=np.float64))
@@ -29,6 +29,9 @@ class RAGPipeline:
                 metadata={"hnsw:space": "cosine"}
             )
         
+        # (chunk count, digest of the stored chunk ids), recomputed lazily after the collection changes
+        self._fingerprint = None
+        
         # Text splitter for chunking documents
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
@@ -38,7 +41,9 @@ class RAGPipeline:
         )
     
     def extract_text_from_pdf(self, pdf_file) -> str:
-        """Extract text from PDF file"""
+        """Extract text from PDF file, or pass through text that was already extracted"""
+        if isinstance(pdf_file, str):
+            return pdf_file
         try:
             pdf_reader = PyPDF2.PdfReader(pdf_file)
             text = ""
@@ -51,7 +56,7 @@ class RAGPipeline:
     def extract_text_from_csv(self, csv_file) -> str:
         """Extract text representation from CSV file"""
         try:
-            df = pd.read_csv(csv_file)
+            df = csv_file if isinstance(csv_file, pd.DataFrame) else pd.read_csv(csv_file)
             # Create a text summary of the CSV
             text = f"Dataset with {len(df)} rows and {len(df.columns)} columns.\n"
             text += f"Columns: {', '.join(df.columns)}\n\n"
@@ -74,7 +79,7 @@ class RAGPipeline:
     def extract_text_from_excel(self, excel_file) -> str:
         """Extract text representation from Excel file"""
         try:
-            df = pd.read_excel(excel_file)
+            df = excel_file if isinstance(excel_file, pd.DataFrame) else pd.read_excel(excel_file)
             # Similar to CSV processing
             text = f"Excel dataset with {len(df)} rows and {len(df.columns)} columns.\n"
             text += f"Columns: {', '.join(df.columns)}\n\n"
@@ -92,7 +97,7 @@ class RAGPipeline:
             return f"Error processing Excel: {str(e)}"
     
     def add_document(self, file_content, filename: str, file_type: str):
-        """Add a document to the vector store"""
+        """Add a document to the vector store; file_content may be a file, a parsed DataFrame or extracted PDF text"""
         try:
             # Extract text based on file type
             if file_type == 'pdf':
@@ -104,6 +109,22 @@ class RAGPipeline:
             else:
                 text = str(file_content)
             
+            return self.add_parsed_text(text, filename, file_type)
+            
+        except Exception as e:
+            return f"Error adding document: {str(e)}"
+    
+    def add_parsed_dataframe(self, df: pd.DataFrame, filename: str, file_type: str = 'csv'):
+        """Add an already-parsed CSV or Excel table without reading the file again"""
+        if file_type == 'excel':
+            text = self.extract_text_from_excel(df)
+        else:
+            text = self.extract_text_from_csv(df)
+        return self.add_parsed_text(text, filename, file_type)
+    
+    def add_parsed_text(self, text: str, filename: str, file_type: str):
+        """Chunk and store text that has already been extracted from a document"""
+        try:
             # Split text into chunks
             documents = self.text_splitter.split_text(text)
             
@@ -132,23 +153,34 @@ class RAGPipeline:
             
         except Exception as e:
             return f"Error adding document: {str(e)}"
+        finally:
+            # Even a partial add changes the stored chunks
+            self._fingerprint = None
     
-    def search_documents(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Search for relevant documents"""
+    def search_documents(self, query: str, n_results: int = 5, query_embedding=None,
+                         min_relevance: float = 0.0, file_type: str = None) -> List[Dict]:
+        """
+        Search for relevant documents, reusing query_embedding if the caller already has one.
+        Only chunks of the given file_type with a relevance score of at least min_relevance are returned.
+        """
         try:
             # Generate query embedding
-            query_embedding = self.embedding_model.encode(query).tolist()
+            if query_embedding is None:
+                query_embedding = self.embedding_model.encode(query)
             
-            # Search in ChromaDB
+            # Search in ChromaDB, letting it filter on file type
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=[np.asarray(query_embedding).tolist()],
                 n_results=n_results,
+                where={"file_type": file_type} if file_type else None,
                 include=['documents', 'metadatas', 'distances']
             )
             
-            # Format results
+            # Format results; they arrive nearest first, so stop at the first one below min_relevance
             search_results = []
             for i in range(len(results['documents'][0])):
+                if 1 - results['distances'][0][i] < min_relevance:
+                    break
                 search_results.append({
                     'content': results['documents'][0][i],
                     'metadata': results['metadatas'][0][i],
@@ -187,6 +219,7 @@ class RAGPipeline:
     
     def clear_database(self):
         """Clear all documents from the database"""
+        self._fingerprint = None
         try:
             # Delete the collection and recreate it
             self.client.delete_collection("financial_docs")
@@ -198,6 +231,17 @@ class RAGPipeline:
         except Exception as e:
             return f"Error clearing database: {str(e)}"
     
+    def document_fingerprint(self) -> str:
+        """
+        Digest identifying the exact set of chunks in the collection. Other pipelines may write to the
+        same persisted directory, so the memoized digest is also recomputed whenever the chunk count changes.
+        """
+        count = self.collection.count()
+        if self._fingerprint is None or self._fingerprint[0] != count:
+            ids = self.collection.get(include=[])['ids']
+            self._fingerprint = (count, hashlib.blake2b("\n".join(sorted(ids)).encode(), digest_size=16).hexdigest())
+        return self._fingerprint[1]
+    
     def get_collection_stats(self) -> Dict:
         """Get statistics about the document collection"""
         try:
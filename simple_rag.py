@@ -21,7 +21,9 @@ class SimpleRAGPipeline:
         self.load_documents()
     
     def extract_text_from_pdf(self, pdf_file) -> str:
-        """Extract text from PDF file"""
+        """Extract text from PDF file, or pass through text that was already extracted"""
+        if isinstance(pdf_file, str):
+            return pdf_file
         try:
             pdf_reader = PyPDF2.PdfReader(pdf_file)
             text = ""
@@ -34,7 +36,7 @@ class SimpleRAGPipeline:
     def extract_text_from_csv(self, csv_file) -> str:
         """Extract text representation from CSV file"""
         try:
-            df = pd.read_csv(csv_file)
+            df = csv_file if isinstance(csv_file, pd.DataFrame) else pd.read_csv(csv_file)
             # Create a text summary of the CSV
             text = f"Dataset with {len(df)} rows and {len(df.columns)} columns.\n"
             text += f"Columns: {', '.join(df.columns)}\n\n"
@@ -57,7 +59,7 @@ class SimpleRAGPipeline:
     def extract_text_from_excel(self, excel_file) -> str:
         """Extract text representation from Excel file"""
         try:
-            df = pd.read_excel(excel_file)
+            df = excel_file if isinstance(excel_file, pd.DataFrame) else pd.read_excel(excel_file)
             # Similar to CSV processing
             text = f"Excel dataset with {len(df)} rows and {len(df.columns)} columns.\n"
             text += f"Columns: {', '.join(df.columns)}\n\n"
@@ -75,7 +77,7 @@ class SimpleRAGPipeline:
             return f"Error processing Excel: {str(e)}"
     
     def add_document(self, file_content, filename: str, file_type: str):
-        """Add a document to the simple storage"""
+        """Add a document to the simple storage; file_content may be a file, a parsed DataFrame or extracted PDF text"""
         try:
             # Extract text based on file type
             if file_type == 'pdf':
@@ -87,6 +89,22 @@ class SimpleRAGPipeline:
             else:
                 text = str(file_content)
             
+            return self.add_parsed_text(text, filename, file_type)
+            
+        except Exception as e:
+            return f"Error adding document: {str(e)}"
+    
+    def add_parsed_dataframe(self, df: pd.DataFrame, filename: str, file_type: str = 'csv'):
+        """Add an already-parsed CSV or Excel table without reading the file again"""
+        if file_type == 'excel':
+            text = self.extract_text_from_excel(df)
+        else:
+            text = self.extract_text_from_csv(df)
+        return self.add_parsed_text(text, filename, file_type)
+    
+    def add_parsed_text(self, text: str, filename: str, file_type: str):
+        """Chunk and store text that has already been extracted from a document"""
+        try:
             # Split text into chunks (simple approach)
             chunks = self.split_text(text, chunk_size=1000)
             
@@ -129,19 +147,22 @@ class SimpleRAGPipeline:
         
         return chunks
     
-    def search_documents(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Simple keyword-based search"""
+    def search_documents(self, query: str, n_results: int = 5, min_relevance: float = 0.0,
+                         file_type: str = None) -> List[Dict]:
+        """Simple keyword-based search, optionally limited to one file_type and a minimum relevance score"""
         try:
             query_words = set(query.lower().split())
             results = []
             
             for doc_id, doc in self.documents.items():
+                if file_type and doc['file_type'] != file_type:
+                    continue
                 for i, chunk in enumerate(doc['chunks']):
                     chunk_words = set(chunk.lower().split())
                     
                     # Simple relevance scoring based on word overlap
                     overlap = len(query_words.intersection(chunk_words))
-                    if overlap > 0:
+                    if overlap > 0 and overlap / len(query_words) >= min_relevance:
                         relevance_score = overlap / len(query_words)
                         results.append({
                             'content': chunk,
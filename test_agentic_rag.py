@@ -0,0 +1,121 @@
+import json
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agentic_rag import FinancialAnalysisAgent
+
+PLAN = [
+    {"step": 1, "tool": "search", "description": "Search", "query": "revenue growth"},
+    {"step": 2, "tool": "summarize", "description": "Summarize", "inputs": ["search_results"]}
+]
+
+class FakeCompletions:
+    """Groq stand-in: streams a JSON plan to planning requests and a fixed summary to the rest"""
+
+    def __init__(self, fail_planning=False):
+        self.fail_planning = fail_planning
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        is_planning = 'Available tools' in json.dumps(kwargs['messages'])
+        if is_planning and self.fail_planning:
+            raise RuntimeError("planning unavailable")
+        text = json.dumps(PLAN) if is_planning else "summary"
+        if kwargs.get('stream'):
+            return iter([types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=text))])
+
+class FakeGroq:
+    def __init__(self, fail_planning=False):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions(fail_planning))
+
+class FakeEmbedder:
+    def encode(self, text):
+        vector = np.zeros(8, dtype=np.float32)
+        for ch in text:
+            vector[ord(ch) % 8] += 1
+        return vector
+
+class FakeRAG:
+    embedding_model = FakeEmbedder()
+
+    def __init__(self):
+        self.fingerprint = "docs-a"
+
+    def search_documents(self, query, n_results=5, query_embedding=None):
+        return [{'content': 'Revenue: $1,200 profit: 30', 'metadata': {'filename': 'a.csv', 'source': 'a.csv (chunk 1)'}, 'relevance_score': 0.8}]
+
+    def get_collection_stats(self):
+        return {'total_documents': 1}
+
+    def document_fingerprint(self):
+        return self.fingerprint
+
+@pytest.fixture(autouse=True)
+def isolated_plan_cache(tmp_path, monkeypatch):
+    # PlanCache persists next to the working directory
+    monkeypatch.chdir(tmp_path)
+
+@pytest.mark.parametrize("plan_cache_enabled", [True, False])
+@pytest.mark.parametrize("response_cache_enabled", [True, False])
+def test_process_query_with_each_cache_combination(plan_cache_enabled, response_cache_enabled):
+    agent = FinancialAnalysisAgent(FakeRAG(), FakeGroq(),
+                                   plan_cache_enabled=plan_cache_enabled,
+                                   response_cache_enabled=response_cache_enabled)
+
+    first = agent.process_query("What is the revenue growth?")
+    second = agent.process_query("What is the revenue growth?")
+
+    assert first['success'], first.get('error')
+    assert second['success'], second.get('error')
+    assert second.get('cached', False) == response_cache_enabled
+
+def test_fallback_plan_is_not_cached():
+    agent = FinancialAnalysisAgent(FakeRAG(), FakeGroq(fail_planning=True), response_cache_enabled=False)
+
+    result = agent.process_query("What is the revenue growth?")
+
+    assert result['success'], result.get('error')
+    assert agent.plan_cache.plans == []
+
+def test_llm_plan_is_cached():
+    agent = FinancialAnalysisAgent(FakeRAG(), FakeGroq(), response_cache_enabled=False)
+
+    agent.process_query("What is the revenue growth?")
+
+    assert agent.plan_cache.plans == [PLAN]
+
+def test_cached_response_requires_same_documents_and_context():
+    rag = FakeRAG()
+    agent = FinancialAnalysisAgent(rag, FakeGroq(), plan_cache_enabled=False)
+    query = "What is the revenue growth?"
+    context = {'uploaded_data': pd.DataFrame({'Revenue': [1.0, 2.0]}), 'pdf_content': "annual report"}
+
+    agent.process_query(query, context)
+    assert agent.process_query(query, dict(context)).get('cached')
+
+    changed = dict(context, uploaded_data=pd.DataFrame({'Revenue': [1.0, 3.0]}))
+    assert not agent.process_query(query, changed).get('cached')
+    assert not agent.process_query(query, dict(context, pdf_content="other report")).get('cached')
+
+    rag.fingerprint = "docs-b"
+    assert not agent.process_query(query, context).get('cached')
+
+def test_fingerprint_failure_bypasses_response_cache():
+    def unavailable():
+        raise RuntimeError("collection unavailable")
+
+    rag = FakeRAG()
+    rag.document_fingerprint = unavailable
+    agent = FinancialAnalysisAgent(rag, FakeGroq(), plan_cache_enabled=False)
+
+    first = agent.process_query("What is the revenue growth?")
+    second = agent.process_query("What is the revenue growth?")
+
+    assert first['success'], first.get('error')
+    assert second['success'], second.get('error')
+    assert not second.get('cached')
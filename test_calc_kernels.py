@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import calc_kernels
+
+# Series laid end to end for the segment kernels, with the length of each
+SEGMENTS = {
+    'constant': [5.0, 5.0, 5.0, 5.0],
+    'two_point': [2.0, 3.0],
+    'zero_mean': [-1.0, 1.0, -2.0, 2.0],
+    'rising': [1.0, 2.0, 4.0, 8.0],
+    'falling': [9.0, 7.0, 7.0, 1.0],
+    'volatile': [1.0, 3.0, 2.0, 5.0, 4.0],
+    'with_nan': [1.0, np.nan, 3.0],
+}
+
+def both_paths(monkeypatch, func, *args):
+    """Results of func with the compiled-loop path and with the NumPy fallback"""
+    monkeypatch.setattr(calc_kernels, 'HAS_NUMBA', True)
+    loop = func(*args)
+    monkeypatch.setattr(calc_kernels, 'HAS_NUMBA', False)
+    fallback = func(*args)
+    return loop, fallback
+
+def segments(names):
+    flat = calc_kernels.as_float_array([x for name in names for x in SEGMENTS[name]])
+    lengths = np.array([len(SEGMENTS[name]) for name in names], dtype=np.intp)
+    return flat, lengths
+
+def test_segment_volatility_paths_agree(monkeypatch):
+    flat, lengths = segments(SEGMENTS)
+
+    loop, fallback = both_paths(monkeypatch, calc_kernels.segment_volatility, flat, lengths)
+
+    np.testing.assert_allclose(loop, fallback, equal_nan=True)
+    # Constant and zero-mean segments have no meaningful coefficient of variation
+    assert loop[0] == 0.0
+    assert loop[2] == 0.0
+
+def test_series_trends_paths_agree(monkeypatch):
+    flat, lengths = segments(SEGMENTS)
+
+    loop, fallback = both_paths(monkeypatch, calc_kernels.series_trends, flat, lengths)
+
+    signs, volatilities, recent_changes, patterns = loop
+    np.testing.assert_array_equal(signs, fallback[0])
+    np.testing.assert_allclose(volatilities, fallback[1], equal_nan=True)
+    np.testing.assert_allclose(recent_changes, fallback[2], equal_nan=True)
+    np.testing.assert_array_equal(patterns, fallback[3])
+    assert patterns[1] == calc_kernels.PATTERN_INSUFFICIENT
+    assert patterns[3] == calc_kernels.PATTERN_GROWTH
+    assert patterns[4] == calc_kernels.PATTERN_DECLINE
+    assert patterns[5] == calc_kernels.PATTERN_VOLATILE
+
+@pytest.mark.parametrize("values", [
+    [[1.0, np.nan], [2.0, np.nan], [np.nan, np.nan], [4.0, np.nan]],  # partial and all-NaN columns
+    [[3.0, -1.0], [3.0, 1.0], [3.0, -2.0], [3.0, 2.0]],               # constant and zero-mean columns
+    [[1.0, 10.0], [2.0, 20.0]],                                       # two rows
+    [[7.0, np.nan]],                                                  # a single row
+])
+def test_column_stats_paths_agree(monkeypatch, values):
+    values = np.array(values)
+
+    loop, fallback = both_paths(monkeypatch, calc_kernels.column_stats, values)
+
+    assert loop.shape == (len(calc_kernels.COLUMN_STAT_LABELS), values.shape[1])
+    np.testing.assert_allclose(loop, fallback, equal_nan=True)